@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pipeline de load_data.py con datos sintéticos
+
+Genera un Pokedex_Limpiado.csv y un árbol locations/csv del tamaño pedido,
+corre cada etapa del loader contra la base de docker-compose y agrega una
+línea JSON por etapa al archivo de resultados (tiempo, filas/s y pico de RSS).
+
+    python bench_loader.py --truncate --species 10000 --zones 100000
+    python bench_loader.py --truncate --modes batch,copy --workers 1,4
+
+OJO: vacía pokemon, zones, encounters y tablas derivadas antes de cada corrida.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import psycopg2
+
+import load_data
+from zone_graph import MAP_LINKS, map_zone_code     # load_data agrega map/ al sys.path
+
+POKEDEX_HEADER = [
+    'No', 'Name', 'Generation', 'Height', 'Weight', 'Type1', 'Type2',
+    'Ability1', 'Ability2', 'Ability_Hidden', 'Gender_Male', 'Gender_Female',
+    'Gender_Unknown', 'Get_Rate', 'Base_Experience', 'Experience_Type', 'Category',
+    'HP', 'Attack', 'Defense', 'SP_Attack', 'SP_Defense', 'Speed', 'Total',
+    'E_HP', 'E_Attack', 'E_Defense', 'E_SP_Attack', 'E_SP_Defense', 'E_Speed'
+]
+LOCATION_HEADER = ['Pokémon', 'Rareza', 'Nivel', 'Método', 'Generación']
+
+TYPES = ['Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison',
+         'Ground', 'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel']
+METHODS = ['Walking', 'Surfing', 'Fishing', 'Rock Smash']
+# Zonas con grilla en map/matrices: las primeras zonas sintéticas llevan estos
+# códigos para que la etapa de distancias tenga aristas reales que calcular
+LINKED_ZONES = sorted({code for a, _, b, _ in MAP_LINKS for code in (map_zone_code(a), map_zone_code(b))
+                       if code is not None})
+RARITIES = ['Common', 'Uncommon', 'Rare', 'Very Rare', 'Limited']
+
+def generate_dataset(root, species, zones, per_zone, seed=0):
+    """
+    Escribe Pokedex_Limpiado.csv y locations/csv/*.csv sintéticos bajo `root`.
+    Las primeras zonas usan los códigos de LINKED_ZONES y el resto synth-zone-*.
+    """
+    rng = random.Random(seed)
+    names = [f"Synthmon {n}" for n in range(1, species + 1)]
+
+    with open(os.path.join(root, 'Pokedex_Limpiado.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(POKEDEX_HEADER)
+        for n, name in enumerate(names, start=1):
+            stats = [rng.randint(5, 160) for _ in range(6)]
+            evs = [0] * 6
+            evs[rng.randrange(6)] = rng.randint(1, 3)
+            writer.writerow([
+                n, name, 1 + n % 9, round(rng.uniform(0.1, 20), 1), round(rng.uniform(0.1, 900), 1),
+                rng.choice(TYPES), rng.choice(TYPES + ['']), 'Overgrow', '', 'Chlorophyll',
+                50.0, 50.0, 0, rng.randint(3, 255), rng.randint(30, 300), 1000000, 'Ordinary',
+                *stats, sum(stats), *evs
+            ])
+
+    locations_dir = os.path.join(root, 'locations', 'csv')
+    os.makedirs(locations_dir, exist_ok=True)
+    for z in range(zones):
+        code = LINKED_ZONES[z] if z < len(LINKED_ZONES) else f"synth-zone-{z:06d}"
+        with open(os.path.join(locations_dir, f"{code}.csv"), 'w',
+                  newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(LOCATION_HEADER)
+            for _ in range(per_zone):
+                low = rng.randint(2, 60)
+                level = f"{low}-{low + rng.randint(0, 10)}" if rng.random() < 0.7 else str(low)
+                writer.writerow([rng.choice(names), rng.choice(RARITIES), level,
+                                 rng.choice(METHODS), 'Generation 3'])
+    return os.path.join(root, 'Pokedex_Limpiado.csv'), locations_dir
+
+def truncate_tables(conn):
+    cursor = conn.cursor()
+    load_data.ensure_manifest(cursor)
+    load_data.ensure_distance_cache(cursor)
+    cursor.execute("""
+        TRUNCATE pokemon, zones, encounters, zone_distances, zone_distance_cache, load_manifest
+        RESTART IDENTITY CASCADE
+    """)
+    conn.commit()
+
+def count_rows(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+def run_stage(fn):
+    """
+    Corre `fn(conn) -> (tabla, filas)` en un proceso hijo y devuelve
+    (segundos, tabla, filas, pico_rss_kb). El pico sale de wait4() del hijo,
+    así cada etapa mide su propio máximo y no el acumulado del benchmark;
+    incluye los procesos del pool que el hijo haya esperado.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            conn = psycopg2.connect(**load_data.DB_CONFIG)
+            start = time.perf_counter()
+            table, rows = fn(conn)
+            payload = {'seconds': time.perf_counter() - start, 'table': table, 'rows': rows}
+            conn.close()
+        except Exception as e:
+            payload = {'error': repr(e)}
+            status = 1
+        with os.fdopen(write_fd, 'w') as out:
+            json.dump(payload, out)
+        os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as inp:
+        payload = json.loads(inp.read() or '{}')
+    _, _, usage = os.wait4(pid, 0)
+    if 'error' in payload:
+        raise RuntimeError(f"Etapa falló: {payload['error']}")
+    return payload['seconds'], payload['table'], payload['rows'], usage.ru_maxrss
+
+def pipeline_stages(csv_path, locations_dir, mode, workers):
+    """Etapas de load_data.py en orden, como (nombre, función(conn) -> (tabla, filas))"""
+    def pokemon(conn):
+        load_data.load_pokemon_data(conn, csv_path, mode=mode)
+        return 'pokemon', count_rows(conn, 'pokemon')
+
+    def encounters(conn):
+        load_data.load_zones_and_encounters(conn, locations_dir, mode=mode, workers=workers)
+        return 'encounters', count_rows(conn, 'encounters')
+
+    def distances(conn):
+        # Solo las zonas de LINKED_ZONES tienen grilla: el costo no crece con --zones
+        cursor = conn.cursor()
+        cursor.execute("SELECT code, id FROM zones ORDER BY code")
+        load_data.calculate_zone_distances(conn, dict(cursor.fetchall()))
+        return 'zone_distances', count_rows(conn, 'zone_distances')
+
+    def refresh(conn):
+        load_data.refresh_zone_ev_rates(conn)
+        return 'zone_ev_rates_mv', count_rows(conn, 'zone_ev_rates_mv')
+
+    return [('pokemon', pokemon), ('encounters', encounters),
+            ('zone_distances', distances), ('refresh_mv', refresh)]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmark de load_data.py con datos sintéticos.")
+    ap.add_argument("--species", type=int, default=10000, help="Especies sintéticas (default: 10000).")
+    ap.add_argument("--zones", type=int, default=1000, help="CSVs de zona sintéticos (default: 1000).")
+    ap.add_argument("--per-zone", type=int, default=10, help="Encuentros por zona (default: 10).")
+    ap.add_argument("--modes", default="batch,copy", help="Modos a medir, separados por coma.")
+    ap.add_argument("--workers", default="1", help="Valores de --workers a medir, separados por coma.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--data-dir", help="Dónde generar los CSVs (default: directorio temporal).")
+    ap.add_argument("--out", default="bench_results.jsonl", help="Archivo JSON Lines de resultados.")
+    ap.add_argument("--truncate", action="store_true",
+                    help="Confirma que se pueden vaciar las tablas de la base antes de cada corrida.")
+    return ap.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.truncate:
+        print("❌ El benchmark vacía pokemon/zones/encounters; pasa --truncate para confirmar")
+        return
+    if not load_data.wait_for_db():
+        print("❌ No se pudo conectar a la base de datos")
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='pokebench-')
+    os.makedirs(data_dir, exist_ok=True)
+    print(f"🧪 Generando {args.species} especies y {args.zones} zonas en {data_dir}...")
+    start = time.perf_counter()
+    csv_path, locations_dir = generate_dataset(data_dir, args.species, args.zones,
+                                               args.per_zone, args.seed)
+    print(f"✓ Datos generados en {time.perf_counter() - start:.1f}s")
+
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'species': args.species,
+        'zones': args.zones,
+        'per_zone': args.per_zone,
+    }
+
+    try:
+        with open(args.out, 'a', encoding='utf-8') as out:
+            for mode in args.modes.split(','):
+                for workers in (int(w) for w in args.workers.split(',')):
+                    print(f"\n▶ modo={mode} workers={workers}")
+                    conn = psycopg2.connect(**load_data.DB_CONFIG)
+                    truncate_tables(conn)
+                    conn.close()
+
+                    for stage, fn in pipeline_stages(csv_path, locations_dir, mode, workers):
+                        seconds, table, rows, rss = run_stage(fn)
+                        record = dict(meta, mode=mode, workers=workers, stage=stage, table=table,
+                                      rows=rows, seconds=round(seconds, 4),
+                                      rows_per_sec=round(rows / seconds, 1) if seconds else None,
+                                      peak_rss_kb=rss)
+                        out.write(json.dumps(record) + '\n')
+                        out.flush()
+                        print(f"  {stage:<15} {seconds:>9.3f}s {rows:>10} filas "
+                              f"{record['rows_per_sec'] or 0:>12,.0f} filas/s {rss / 1024:>8.1f} MB RSS")
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(f"\n✅ Resultados agregados a {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,123 @@
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Limpia Pokedex_Ver_SV2.csv y deja el Pokédex que carga load_data.py.
 
-# Cargar el dataset original
-input_filename = 'Pokedex_Ver_SV2.csv'
-output_filename = 'Pokedex_Limpiado.csv'
+Se leen solo las columnas necesarias, con tipos explícitos y por bloques
+(--chunksize), así que un Pokédex de varios juegos no se carga entero en
+memoria. Cada bloque se filtra y se agrega a:
 
-try:
-    df = pd.read_csv(input_filename)
-except FileNotFoundError:
-    print(f"Error: El archivo '{input_filename}' no se encontró.")
-    exit()
+- Pokedex_Limpiado.csv: el mismo archivo de siempre;
+- Pokedex_Limpiado.parquet: columnar y tipado, que load_data.py lee sin
+  convertir campo por campo (requiere pyarrow; sin él solo sale el CSV).
 
-# --- Limpieza 1: Filtrar por número de Pokémon ---
+    python clean_dataset.py
+    python clean_dataset.py --input otro_dex.csv --chunksize 10000
+"""
+import argparse
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # sin pyarrow solo se escribe el CSV
+    pa = pq = None
 
-# Convertir la columna 'No' a tipo numérico, manejando errores
-df['No'] = pd.to_numeric(df['No'], errors='coerce')
-df.dropna(subset=['No'], inplace=True)
-df['No'] = df['No'].astype(int)
+INPUT_FILENAME = 'Pokedex_Ver_SV2.csv'
+OUTPUT_CSV = 'Pokedex_Limpiado.csv'
+OUTPUT_PARQUET = 'Pokedex_Limpiado.parquet'
+MAX_NO = 386
 
-# Filtrar para incluir solo Pokémon hasta el No 386
-df_limpio = df[df['No'] <= 386]
+# Columnas de salida, en el orden del CSV original, con su tipo al leer.
+# Los enteros son nullable (Int64) porque otros Pokédex traen huecos.
+OUTPUT_DTYPES = {
+    'No': 'string',     # se convierte aparte: los valores no numéricos se descartan
+    'Name': 'string',
+    'Generation': 'Int64',
+    'Height': 'float64',
+    'Weight': 'float64',
+    'Type1': 'string',
+    'Type2': 'string',
+    'Ability1': 'string',
+    'Ability2': 'string',
+    'Ability_Hidden': 'string',
+    'Gender_Male': 'float64',
+    'Gender_Female': 'float64',
+    'Gender_Unknown': 'Int64',
+    'Get_Rate': 'Int64',
+    'Base_Experience': 'Int64',
+    'Experience_Type': 'string',
+    'Category': 'string',
+    'HP': 'Int64',
+    'Attack': 'Int64',
+    'Defense': 'Int64',
+    'SP_Attack': 'Int64',
+    'SP_Defense': 'Int64',
+    'Speed': 'Int64',
+    'Total': 'Int64',
+    'E_HP': 'Int64',
+    'E_Attack': 'Int64',
+    'E_Defense': 'Int64',
+    'E_SP_Attack': 'Int64',
+    'E_SP_Defense': 'Int64',
+    'E_Speed': 'Int64',
+}
+OUTPUT_COLUMNS = list(OUTPUT_DTYPES)
+INPUT_DTYPES = dict(OUTPUT_DTYPES, Branch_Code='string')
 
-# --- Limpieza 2: Filtrar por Branch_Code ---
+def read_chunks(path, chunksize):
+    """Bloques de `path` con solo las columnas de INPUT_DTYPES, ya tipadas"""
+    return pd.read_csv(path, usecols=list(INPUT_DTYPES), dtype=INPUT_DTYPES,
+                       encoding='utf-8-sig', chunksize=chunksize)
 
-# Asegurarse de que la columna 'Branch_Code' sea de tipo string
-df_limpio['Branch_Code'] = df_limpio['Branch_Code'].astype(str)
+def clean_chunk(df, max_no=MAX_NO):
+    """Pokémon con número <= max_no y forma base (Branch_Code '*_0'), en el orden de OUTPUT_COLUMNS"""
+    no = pd.to_numeric(df['No'], errors='coerce')
+    keep = no.notna() & (no <= max_no) & df['Branch_Code'].str.endswith('_0').fillna(False)
+    out = df.loc[keep, OUTPUT_COLUMNS]
+    return out.assign(No=no[keep].astype('int64'))
 
-# Mantener solo las filas donde Branch_Code termina en '_0'
-df_filtrado = df_limpio[df_limpio['Branch_Code'].str.endswith('_0')].copy()
+def main():
+    ap = argparse.ArgumentParser(description="Limpia el Pokédex y lo guarda en CSV y Parquet.")
+    ap.add_argument("--input", default=INPUT_FILENAME, help=f"CSV de origen (default: {INPUT_FILENAME}).")
+    ap.add_argument("--csv", default=OUTPUT_CSV, help=f"CSV de salida (default: {OUTPUT_CSV}).")
+    ap.add_argument("--parquet", default=OUTPUT_PARQUET, help=f"Parquet de salida (default: {OUTPUT_PARQUET}).")
+    ap.add_argument("--chunksize", type=int, default=50000, help="Filas por bloque de lectura (default: 50000).")
+    ap.add_argument("--max-no", type=int, default=MAX_NO, help=f"Último número de Pokédex incluido (default: {MAX_NO}).")
+    args = ap.parse_args()
 
-# --- Limpieza 3: Eliminar columnas innecesarias ---
-columnas_a_eliminar = [
-    'Branch_Code', 'Original_Name', 'Color', 'Egg_Steps', 'Egg_Group1', 
-    'Egg_Group2', 'Mega_Evolution_Flag', 'Region_Form'
-]
-df_final = df_filtrado.drop(columns=columnas_a_eliminar)
+    if not os.path.exists(args.input):
+        print(f"Error: El archivo '{args.input}' no se encontró.")
+        return
+    if pq is None:
+        print("⚠ pyarrow no está instalado: solo se escribe el CSV")
 
-# Guardar el DataFrame final, sobreescribiendo el archivo existente
-df_final.to_csv(output_filename, index=False)
+    # Se escribe a temporales y se reemplaza al final, para no dejar salidas a medias
+    csv_tmp, parquet_tmp = args.csv + '.tmp', args.parquet + '.tmp'
+    writer = None
+    total = chunks = 0
+    try:
+        for chunk in read_chunks(args.input, args.chunksize):
+            df = clean_chunk(chunk, args.max_no)
+            df.to_csv(csv_tmp, mode='a' if chunks else 'w', header=not chunks, index=False)
+            chunks += 1
+            if pq is not None:
+                table = pa.Table.from_pandas(df, preserve_index=False,
+                                             schema=writer.schema if writer else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_tmp, table.schema)
+                writer.write_table(table)
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
 
-print(f"Dataset limpiado y guardado como '{output_filename}'")
-print(f"El dataset ahora contiene {len(df_final)} registros después de la limpieza completa.")
+    os.replace(csv_tmp, args.csv)
+    print(f"Dataset limpiado y guardado como '{args.csv}'")
+    if writer is not None:
+        os.replace(parquet_tmp, args.parquet)
+        print(f"✓ Versión tipada guardada como '{args.parquet}'")
+    print(f"El dataset ahora contiene {total} registros después de la limpieza completa.")
 
+if __name__ == '__main__':
+    main()
@@ -99,6 +99,24 @@ CREATE TABLE zone_distances (
 CREATE INDEX idx_distances_from ON zone_distances(from_zone_id);
 CREATE INDEX idx_distances_to ON zone_distances(to_zone_id);
 
+-- Caché opcional de distancias mínimas entre todo par de zonas conectadas
+-- (se llena con load_data.py --all-pairs a partir de zone_distances)
+CREATE TABLE zone_distance_cache (
+    from_zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+    to_zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+    distance_tiles INTEGER NOT NULL,
+    PRIMARY KEY (from_zone_id, to_zone_id)
+);
+
+-- Manifiesto de archivos cargados (recarga incremental de load_data.py)
+CREATE TABLE load_manifest (
+    path VARCHAR(255) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Vista para calcular EVs promedio por zona y estadística
 CREATE OR REPLACE VIEW zone_ev_rates AS
 SELECT 
@@ -120,8 +138,25 @@ JOIN pokemon p ON p.id = e.pokemon_id
 WHERE e.encounter_method = 'Walking'
 GROUP BY z.id, z.code, z.name, e.encounter_method;
 
+-- Versión materializada de zone_ev_rates para consultas frecuentes (ranking
+-- de zonas por estadística). load_data.py la refresca al final de cada carga.
+CREATE MATERIALIZED VIEW zone_ev_rates_mv AS
+SELECT * FROM zone_ev_rates;
+
+-- Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX idx_zone_ev_rates_mv_zone ON zone_ev_rates_mv(zone_id, encounter_method);
+CREATE INDEX idx_zone_ev_rates_mv_hp ON zone_ev_rates_mv(encounter_method, avg_ev_hp DESC);
+CREATE INDEX idx_zone_ev_rates_mv_attack ON zone_ev_rates_mv(encounter_method, avg_ev_attack DESC);
+CREATE INDEX idx_zone_ev_rates_mv_defense ON zone_ev_rates_mv(encounter_method, avg_ev_defense DESC);
+CREATE INDEX idx_zone_ev_rates_mv_sp_attack ON zone_ev_rates_mv(encounter_method, avg_ev_sp_attack DESC);
+CREATE INDEX idx_zone_ev_rates_mv_sp_defense ON zone_ev_rates_mv(encounter_method, avg_ev_sp_defense DESC);
+CREATE INDEX idx_zone_ev_rates_mv_speed ON zone_ev_rates_mv(encounter_method, avg_ev_speed DESC);
+
 COMMENT ON TABLE pokemon IS 'Catálogo de Pokémon con estadísticas base y EVs otorgados';
 COMMENT ON TABLE zones IS 'Zonas de entrenamiento del mapa (nodos del grafo)';
 COMMENT ON TABLE encounters IS 'Encuentros de Pokémon en cada zona con probabilidades';
 COMMENT ON TABLE zone_distances IS 'Distancias entre zonas en tiles (aristas del grafo)';
+COMMENT ON TABLE zone_distance_cache IS 'Distancias mínimas en tiles entre todo par de zonas (cierre de zone_distances)';
+COMMENT ON TABLE load_manifest IS 'Hash de cada CSV con el que se cargaron los datos';
 COMMENT ON VIEW zone_ev_rates IS 'Tasa promedio de EVs por encuentro en cada zona';
+COMMENT ON MATERIALIZED VIEW zone_ev_rates_mv IS 'zone_ev_rates materializada e indexada por método y estadística';
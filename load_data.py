@@ -2,22 +2,68 @@
 """
 Script para cargar todos los datos a PostgreSQL
 Ejecutar después de: docker-compose up -d
+
+Modos de carga:
+    python load_data.py                # execute_batch (por defecto)
+    python load_data.py --mode copy    # COPY ... FROM STDIN en streaming
+    python load_data.py --workers 4    # zonas en paralelo (procesos + pool de conexiones)
+    python load_data.py --incremental  # solo los CSVs que cambiaron (load_manifest)
+    python load_data.py --swap         # staging UNLOGGED + intercambio atómico
+    python load_data.py --sink dry-run # recorre el pipeline sin base de datos
+    python load_data.py --sink file    # escribe las filas normalizadas a CSV
+    python load_data.py --pokedex Pokedex_Limpiado.csv  # fuerza el CSV en lugar del Parquet
+
+El parseo y la normalización viven en load_pipeline.py.
 """
 
 import os
-import csv
+import argparse
+import hashlib
+from collections import Counter
 import psycopg2
 from psycopg2.extras import execute_batch
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import sys
 import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'map'))
+from zone_graph import zone_adjacency, all_pairs_distances
+from load_pipeline import (
+    POKEMON_COLUMNS, ENCOUNTER_COLUMNS, StageStats, PostgresSink, CountSink, CsvSink,
+    pq, report_rate, iter_zone_files, zone_fields, read_csv, pokemon_rows, encounter_rows,
+    normalize_encounters, index_pokemon, build_pokemon_index, report_unmatched
+)
 
 DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'pokemon_ev',
-    'user': 'trainer',
-    'password': 'pikachu123',
-    'port': 5432
+    'host': os.getenv('PGHOST', 'localhost'),
+    'database': os.getenv('PGDATABASE', 'pokemon_ev'),
+    'user': os.getenv('PGUSER', 'trainer'),
+    'password': os.getenv('PGPASSWORD', 'pikachu123'),
+    'port': int(os.getenv('PGPORT', 5432))
 }
 
+POKEDEX_CSV = 'Pokedex_Limpiado.csv'
+POKEDEX_PARQUET = 'Pokedex_Limpiado.parquet'
+MATRICES_DIR = os.path.join('map', 'matrices')
+MATRIX_EXTENSIONS = ('.csv', '.grid')
+
+def default_pokedex():
+    """
+    El Parquet tipado de clean_dataset.py si existe, hay pyarrow y no es más
+    viejo que el CSV; si no, el CSV. Un CSV editado o regenerado a mano no se
+    pisa con un Parquet desactualizado.
+    """
+    if pq is None or not os.path.exists(POKEDEX_PARQUET):
+        return POKEDEX_CSV
+    if os.path.exists(POKEDEX_CSV) and os.path.getmtime(POKEDEX_CSV) > os.path.getmtime(POKEDEX_PARQUET):
+        print(f"⚠ {POKEDEX_CSV} es más nuevo que {POKEDEX_PARQUET}: se carga el CSV "
+              f"(python clean_dataset.py regenera ambos)")
+        return POKEDEX_CSV
+    return POKEDEX_PARQUET
+
 def wait_for_db(max_retries=30):
     """Espera a que la base de datos esté lista"""
     for i in range(max_retries):
@@ -31,219 +77,753 @@ def wait_for_db(max_retries=30):
             time.sleep(2)
     return False
 
-def load_pokemon_data(conn):
+def pokemon_conflict_clause(upsert=False):
+    """ON CONFLICT para pokemon: ignora duplicados o, con upsert, los actualiza"""
+    if not upsert:
+        return "ON CONFLICT (pokedex_number) DO NOTHING"
+    updates = ', '.join(f"{col} = EXCLUDED.{col}" for col in POKEMON_COLUMNS[1:])
+    return f"ON CONFLICT (pokedex_number) DO UPDATE SET {updates}"
+
+def load_pokemon_data(conn, csv_path='Pokedex_Limpiado.csv', mode='batch', upsert=False):
     """Carga datos de Pokémon desde el CSV"""
     print("\n📦 Cargando Pokémon...")
-    
-    csv_path = 'Pokedex_Limpiado.csv'
+
     if not os.path.exists(csv_path):
         print(f"⚠ Archivo no encontrado: {csv_path}")
         return
-    
+
     cursor = conn.cursor()
-    
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        pokemon_data = []
-        
-        for row in reader:
-            def clean_val(val):
-                return None if val == '' else val
-            
-            pokemon_data.append((
-                int(row['No']),
-                row['Name'],
-                int(row['Generation']),
-                float(row['Height']) if row['Height'] else None,
-                float(row['Weight']) if row['Weight'] else None,
-                row['Type1'],
-                clean_val(row['Type2']),
-                clean_val(row['Ability1']),
-                clean_val(row['Ability2']),
-                clean_val(row['Ability_Hidden']),
-                float(row['Gender_Male']) if row['Gender_Male'] else None,
-                float(row['Gender_Female']) if row['Gender_Female'] else None,
-                float(row['Gender_Unknown']) if row['Gender_Unknown'] else None,
-                int(row['Get_Rate']) if row['Get_Rate'] else None,
-                int(row['Base_Experience']) if row['Base_Experience'] else None,
-                clean_val(row['Experience_Type']),
-                clean_val(row['Category']),
-                int(row['HP']),
-                int(row['Attack']),
-                int(row['Defense']),
-                int(row['SP_Attack']),
-                int(row['SP_Defense']),
-                int(row['Speed']),
-                int(row['Total']),
-                int(row['E_HP']),
-                int(row['E_Attack']),
-                int(row['E_Defense']),
-                int(row['E_SP_Attack']),
-                int(row['E_SP_Defense']),
-                int(row['E_Speed'])
-            ))
-    
-    insert_query = """
-        INSERT INTO pokemon (
-            pokedex_number, name, generation, height, weight,
-            type1, type2, ability1, ability2, ability_hidden,
-            gender_male, gender_female, gender_unknown,
-            capture_rate, base_experience, experience_type, category,
-            base_hp, base_attack, base_defense, base_sp_attack, base_sp_defense, base_speed, base_total,
-            ev_hp, ev_attack, ev_defense, ev_sp_attack, ev_sp_defense, ev_speed
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        ) ON CONFLICT (pokedex_number) DO NOTHING
-    """
-    
-    execute_batch(cursor, insert_query, pokemon_data)
+    start = time.perf_counter()
+    stats = StageStats('pokemon')
+
+    # En modo copy el sumidero pasa por una tabla temporal, porque COPY no admite ON CONFLICT
+    sink = PostgresSink(cursor, 'pokemon', POKEMON_COLUMNS, mode, pokemon_conflict_clause(upsert))
+    count = stats.sink(sink, pokemon_rows(csv_path, stats))
     conn.commit()
-    print(f"✓ {len(pokemon_data)} Pokémon cargados")
+    report_rate('pokemon', count, time.perf_counter() - start)
+    stats.report()
+    print(f"✓ {count} Pokémon cargados")
+
+def upsert_zone(cursor, zone_code, zone_name, zone_type):
+    """Inserta o actualiza una zona y devuelve su id"""
+    cursor.execute("""
+        INSERT INTO zones (code, name, region, zone_type)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (code) DO UPDATE SET name = EXCLUDED.name
+        RETURNING id
+    """, (zone_code, zone_name, 'Kanto', zone_type))
+    return cursor.fetchone()[0]
+
+def replace_zone_encounters(cursor, sink, zone_code, rows, pokemon_index, unmatched, stats):
+    """
+    Reemplaza los encuentros de una zona a partir de sus filas de CSV (dicts):
+    upsert de la zona, DELETE de sus encuentros e inserción por `sink`. El
+    commit queda a cargo de quien llama, para que todo sea una transacción.
+    Devuelve (zone_id, encuentros insertados).
+    """
+    zone_id = upsert_zone(cursor, zone_code, *zone_fields(zone_code))
+    cursor.execute("DELETE FROM encounters WHERE zone_id = %s", (zone_id,))
+    keyed = ((zone_id, row) for row in rows)
+    return zone_id, stats.sink(sink, normalize_encounters(keyed, pokemon_index, unmatched, stats))
+
+_worker_pokemon_index = None
+
+def _init_parse_worker(pokemon_index):
+    global _worker_pokemon_index
+    _worker_pokemon_index = pokemon_index
+
+def _parse_zone_file(zone_id, filepath):
+    """Tarea del pool de procesos: parsea y normaliza un CSV de zona completo"""
+    unmatched = Counter()
+    stats = StageStats('encounters')
+    rows = list(encounter_rows([(zone_id, filepath)], _worker_pokemon_index, unmatched, stats))
+    return rows, unmatched, stats.stages
+
+def supports_two_phase(conn, workers):
+    """True si el servidor admite `workers` transacciones preparadas a la vez"""
+    cursor = conn.cursor()
+    cursor.execute("SHOW max_prepared_transactions")
+    return int(cursor.fetchone()[0]) >= workers
+
+def load_encounters_parallel(zone_files, pokemon_index, unmatched, mode='batch', workers=4, stats=None):
+    """
+    Carga los encuentros de `zone_files` [(zone_id, filepath)] en paralelo.
+
+    El parseo y la normalización de cada CSV corren en un pool de procesos.
+    Las inserciones usan un ThreadedConnectionPool acotado a `workers`
+    conexiones: las zonas (ya ordenadas) se reparten en round-robin y cada
+    conexión borra los encuentros previos de su parte y la carga en una sola
+    transacción.
+
+    Si el servidor lo permite (max_prepared_transactions >= workers) las
+    transacciones usan commit en dos fases: se preparan todas y solo entonces
+    se confirman, así que si cualquier shard falla antes de prepararse se
+    descartan todas. Sin transacciones preparadas los shards se confirman en
+    orden uno tras otro: si falla el commit k, los shards 0..k-1 ya quedaron
+    cargados y solo se deshacen los siguientes (la carga queda parcial y hay
+    que volver a correrla).
+    """
+    shards = [zone_files[i::workers] for i in range(workers)]
+    db_pool = ThreadedConnectionPool(1, workers, **DB_CONFIG)
+    shard_conns = [db_pool.getconn(key=i) for i in range(workers)]
+    two_phase = supports_two_phase(shard_conns[0], workers)
+    if not two_phase:
+        print("⚠ max_prepared_transactions < workers: los shards se confirman uno tras otro "
+              "y un fallo a mitad de los commits deja la carga parcial")
+    shard_conns[0].rollback()   # cierra la transacción del SHOW
+    begun, prepared = [], []    # conexiones con tpc_begin / tpc_prepare hechos
+
+    try:
+        if two_phase:
+            batch = uuid.uuid4().hex
+            for key, shard_conn in enumerate(shard_conns):
+                shard_conn.tpc_begin(shard_conn.xid(0, f"encounters-{batch}-{key}", "load_data"))
+                begun.append(shard_conn)
+
+        with ProcessPoolExecutor(workers, initializer=_init_parse_worker,
+                                 initargs=(pokemon_index,)) as procs:
+            parsed = {zone_id: procs.submit(_parse_zone_file, zone_id, filepath)
+                      for zone_id, filepath in zone_files}
+
+            def insert_shard(key):
+                cursor = shard_conns[key].cursor()
+                # Los encuentros previos de las zonas del shard se borran en su
+                # misma transacción: una recarga completa reemplaza, no agrega
+                cursor.execute("DELETE FROM encounters WHERE zone_id = ANY(%s)",
+                               ([zone_id for zone_id, _ in shards[key]],))
+                sink = PostgresSink(cursor, 'encounters', ENCOUNTER_COLUMNS, mode)
+                count = 0
+                for zone_id, _ in shards[key]:
+                    rows, missing, _ = parsed[zone_id].result()
+                    unmatched.update(missing)
+                    count += sink.consume(rows)
+                return count
 
-def load_zones_and_encounters(conn):
-    """Carga zonas y encuentros desde los CSVs de locations"""
+            with ThreadPoolExecutor(workers) as threads:
+                counts = [f.result() for f in
+                          [threads.submit(insert_shard, key) for key in range(workers)]]
+
+        if two_phase:
+            for shard_conn in shard_conns:
+                shard_conn.tpc_prepare()
+                prepared.append(shard_conn)
+            for shard_conn in shard_conns:
+                shard_conn.tpc_commit()
+        else:
+            for shard_conn in shard_conns:
+                shard_conn.commit()
+        if stats is not None:
+            # Tiempos de parseo sumados entre procesos (CPU, no tiempo de pared)
+            for future in parsed.values():
+                stats.merge(future.result()[2])
+        return sum(counts)
+    except Exception:
+        if two_phase and len(prepared) == workers:
+            # Con todo preparado la decisión ya es confirmar: las que falten
+            # quedan en pg_prepared_xacts para terminarlas con COMMIT PREPARED
+            print("❌ Falló el commit de shards ya preparados; ver pg_prepared_xacts (COMMIT PREPARED)")
+        else:
+            for key, shard_conn in enumerate(shard_conns):
+                # Un error acá no debe tapar el original, que es el que se relanza
+                try:
+                    if shard_conn in begun:
+                        shard_conn.tpc_rollback()
+                    else:
+                        shard_conn.rollback()
+                except Exception as e:
+                    print(f"⚠ No se pudo deshacer el shard {key}: {e}")
+        raise
+    finally:
+        for key, shard_conn in enumerate(shard_conns):
+            db_pool.putconn(shard_conn, key=key)
+        db_pool.closeall()
+
+def load_zones_and_encounters(conn, locations_dir='locations/csv', mode='batch', workers=1):
+    """
+    Carga zonas y encuentros desde los CSVs de locations. Los encuentros de
+    cada zona cargada se reemplazan, así que repetir la carga no duplica.
+    """
     print("\n📍 Cargando zonas y encuentros...")
-    
-    locations_dir = 'locations/csv'
+
     if not os.path.exists(locations_dir):
         print(f"⚠ Directorio no encontrado: {locations_dir}")
         return
-    
+
     cursor = conn.cursor()
     zone_id_map = {}
-    
-    for filename in os.listdir(locations_dir):
-        if not filename.endswith('.csv'):
+    start = time.perf_counter()
+
+    pokemon_index = build_pokemon_index(cursor)
+    unmatched = Counter()
+    stats = StageStats('encounters')
+
+    # Los ids de zona se asignan en serie y en orden alfabético, antes de
+    # insertar encuentros, para que no dependan del modo ni de los workers.
+    zone_files = []
+    for zone_code, zone_name, zone_type, filepath in iter_zone_files(locations_dir):
+        zone_id_map[zone_code] = upsert_zone(cursor, zone_code, zone_name, zone_type)
+        zone_files.append((zone_id_map[zone_code], filepath))
+
+    if workers > 1:
+        conn.commit()
+        inserted = load_encounters_parallel(zone_files, pokemon_index, unmatched, mode, workers, stats)
+    else:
+        # Un solo flujo para todos los archivos, con los ids ya resueltos en
+        # memoria; los encuentros previos de esas zonas se reemplazan en la
+        # misma transacción, así una segunda carga completa no duplica
+        cursor.execute("DELETE FROM encounters WHERE zone_id = ANY(%s)",
+                       ([zone_id for zone_id, _ in zone_files],))
+        sink = PostgresSink(cursor, 'encounters', ENCOUNTER_COLUMNS, mode)
+        inserted = stats.sink(sink, encounter_rows(zone_files, pokemon_index, unmatched, stats))
+        conn.commit()
+
+    report_rate('encounters', inserted, time.perf_counter() - start)
+    stats.report()
+    report_unmatched(unmatched)
+    print(f"✓ {len(zone_id_map)} zonas y {inserted} encuentros cargados")
+    return zone_id_map
+
+def _remember_pokemon(rows, seen):
+    """Deja pasar las filas del Pokédex anotando (pokedex_number, nombre)"""
+    for row in rows:
+        seen.append(row[:2])
+        yield row
+
+def load_offline(sink_kind, csv_path='Pokedex_Limpiado.csv', locations_dir='locations/csv',
+                 out_dir='normalized'):
+    """
+    Corre el pipeline completo sin base de datos. Los nombres se resuelven
+    contra el Pokédex recién parseado, así que los encuentros llevan
+    (zone_code, pokedex_number) en lugar de los ids de la base.
+    """
+    def make_sink(name, columns):
+        if sink_kind == 'file':
+            return CsvSink(os.path.join(out_dir, f"{name}.csv"), columns)
+        return CountSink()
+
+    print(f"\n📦 Pipeline sin base de datos (sumidero {sink_kind})...")
+    seen = []
+    stats = StageStats('pokemon')
+    rows = _remember_pokemon(pokemon_rows(csv_path, stats), seen)
+    count = stats.sink(make_sink('pokemon', POKEMON_COLUMNS), rows)
+    stats.report()
+    print(f"✓ {count} Pokémon procesados")
+
+    unmatched = Counter()
+    stats = StageStats('encounters')
+    zone_files = [(zone_code, filepath) for zone_code, _, _, filepath in iter_zone_files(locations_dir)]
+    columns = ('zone_code', 'pokedex_number') + ENCOUNTER_COLUMNS[2:]
+    rows = encounter_rows(zone_files, index_pokemon(seen), unmatched, stats)
+    count = stats.sink(make_sink('encounters', columns), rows)
+    stats.report()
+    report_unmatched(unmatched)
+    print(f"✓ {len(zone_files)} zonas y {count} encuentros procesados")
+    if sink_kind == 'file':
+        print(f"✓ Archivos escritos en {out_dir}")
+
+def file_sha256(path):
+    """SHA-256 del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ensure_manifest(cursor):
+    """Crea load_manifest si la base se inicializó con un esquema anterior"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS load_manifest (
+            path VARCHAR(255) PRIMARY KEY,
+            sha256 CHAR(64) NOT NULL,
+            size_bytes BIGINT NOT NULL,
+            mtime_ns BIGINT NOT NULL,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def ensure_distance_cache(cursor):
+    """Crea zone_distance_cache si la base se inicializó con un esquema anterior"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS zone_distance_cache (
+            from_zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+            to_zone_id INTEGER NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+            distance_tiles INTEGER NOT NULL,
+            PRIMARY KEY (from_zone_id, to_zone_id)
+        )
+    """)
+
+def read_manifest(cursor):
+    """Devuelve {path: (sha256, size_bytes, mtime_ns)} de la última carga"""
+    ensure_manifest(cursor)
+    cursor.execute("SELECT path, sha256, size_bytes, mtime_ns FROM load_manifest")
+    return {path: (sha, size, mtime) for path, sha, size, mtime in cursor.fetchall()}
+
+def file_state(path, manifest):
+    """
+    Devuelve (cambió, entrada_nueva) para un archivo. Si tamaño y mtime
+    coinciden con el manifiesto no se vuelve a leer; si no, decide el hash.
+    """
+    st = os.stat(path)
+    previous = manifest.get(path)
+    if previous and previous[1:] == (st.st_size, st.st_mtime_ns):
+        return False, previous
+    entry = (file_sha256(path), st.st_size, st.st_mtime_ns)
+    return previous is None or previous[0] != entry[0], entry
+
+def record_manifest(cursor, path, entry):
+    """Registra el hash con el que quedó cargado un archivo"""
+    cursor.execute("""
+        INSERT INTO load_manifest (path, sha256, size_bytes, mtime_ns)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (path) DO UPDATE SET
+            sha256 = EXCLUDED.sha256, size_bytes = EXCLUDED.size_bytes,
+            mtime_ns = EXCLUDED.mtime_ns, loaded_at = CURRENT_TIMESTAMP
+    """, (path,) + tuple(entry))
+
+def record_full_load(conn, csv_path='Pokedex_Limpiado.csv', locations_dir='locations/csv',
+                     matrices_dir=MATRICES_DIR):
+    """Tras una carga completa, deja el manifiesto al día para recargas incrementales"""
+    cursor = conn.cursor()
+    manifest = read_manifest(cursor)
+    paths = [csv_path] + [filepath for *_, filepath in iter_zone_files(locations_dir)]
+    if os.path.isdir(matrices_dir):
+        paths += [os.path.join(matrices_dir, f) for f in sorted(os.listdir(matrices_dir)) if f.endswith(MATRIX_EXTENSIONS)]
+    for path in paths:
+        if os.path.exists(path):
+            record_manifest(cursor, path, file_state(path, manifest)[1])
+    conn.commit()
+
+def load_incremental(conn, csv_path='Pokedex_Limpiado.csv', locations_dir='locations/csv', mode='batch',
+                     matrices_dir=MATRICES_DIR):
+    """
+    Recarga solo los archivos cuyo hash cambió respecto a load_manifest.
+
+    Cada zona modificada se reemplaza en su propia transacción (upsert de la
+    zona, DELETE de sus encuentros, inserción y manifiesto), así que nunca
+    quedan encuentros duplicados ni a medias. Si cambia el Pokédex se
+    actualizan los Pokémon y se recargan todas las zonas, porque nombres
+    antes desconocidos pueden pasar a resolverse.
+
+    Devuelve (zone_id_map con todas las zonas, hay_que_recalcular_distancias).
+    """
+    print("\n🔁 Recarga incremental...")
+    cursor = conn.cursor()
+    manifest = read_manifest(cursor)
+    conn.commit()
+
+    dex_changed, dex_entry = file_state(csv_path, manifest)
+    if dex_changed:
+        load_pokemon_data(conn, csv_path, mode=mode, upsert=True)
+        record_manifest(cursor, csv_path, dex_entry)
+        conn.commit()
+    else:
+        print("✓ Pokédex sin cambios")
+
+    start = time.perf_counter()
+    pokemon_index = build_pokemon_index(cursor)
+    unmatched = Counter()
+    stats = StageStats('encounters')
+    sink = PostgresSink(cursor, 'encounters', ENCOUNTER_COLUMNS, mode)
+    reloaded = inserted = 0
+    seen = set()
+
+    for zone_code, _, _, filepath in iter_zone_files(locations_dir):
+        seen.add(filepath)
+        changed, entry = file_state(filepath, manifest)
+        if not (changed or dex_changed):
+            if entry != manifest[filepath]:
+                # Mismo contenido con otro mtime: se actualiza para no volver a hashearlo
+                record_manifest(cursor, filepath, entry)
+                conn.commit()
             continue
-        
-        zone_code = filename.replace('.csv', '')
-        zone_name = zone_code.replace('kanto-', '').replace('-', ' ').title()
-        
+
+        rows = stats.track('leer', read_csv(filepath))
+        inserted += replace_zone_encounters(cursor, sink, zone_code, rows, pokemon_index, unmatched, stats)[1]
+        record_manifest(cursor, filepath, entry)
+        conn.commit()
+        reloaded += 1
+
+    # CSVs que ya no existen: se quitan sus encuentros, la zona se conserva
+    prefix = os.path.join(locations_dir, '')
+    removed = [path for path in manifest if path.startswith(prefix) and path not in seen]
+    for path in removed:
+        zone_code = os.path.basename(path).replace('.csv', '')
         cursor.execute("""
-            INSERT INTO zones (code, name, region, zone_type)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (code) DO UPDATE SET name = EXCLUDED.name
-            RETURNING id
-        """, (zone_code, zone_name, 'Kanto', 'Route' if 'route' in zone_code else 'Location'))
-        
-        zone_id = cursor.fetchone()[0]
-        zone_id_map[zone_code] = zone_id
-        
-        filepath = os.path.join(locations_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            encounters = []
-            
-            for row in reader:
-                pokemon_name = row['Pokémon'].strip()
-                
-                cursor.execute("SELECT id FROM pokemon WHERE name = %s", (pokemon_name,))
-                result = cursor.fetchone()
-                if not result:
-                    continue
-                
-                pokemon_id = result[0]
-                
-                # Parsear nivel - manejar casos especiales
-                nivel_str = row['Nivel'].strip()
-                
-                # Saltar si no hay nivel válido
-                if not nivel_str or nivel_str in ['—', '-', 'N/A', '']:
-                    continue
-                
-                try:
-                    if '-' in nivel_str:
-                        parts = nivel_str.split('-')
-                        min_level = int(parts[0].strip())
-                        max_level = int(parts[1].strip())
-                    else:
-                        min_level = max_level = int(nivel_str)
-                except (ValueError, IndexError):
-                    # Si no se puede parsear, saltar este registro
-                    continue
-                
-                avg_level = (min_level + max_level) / 2.0
-                
-                rarity_map = {
-                    'Common': 40.0,
-                    'Uncommon': 20.0,
-                    'Rare': 10.0,
-                    'Very Rare': 5.0
-                }
-                
-                rarity = row['Rareza'].strip()
-                probability = rarity_map.get(rarity, 10.0)
-                
-                encounters.append((
-                    zone_id,
-                    pokemon_id,
-                    row['Método'].strip(),
-                    rarity,
-                    min_level,
-                    max_level,
-                    avg_level,
-                    probability,
-                    row.get('Generación', 'Generation 3')
-                ))
-            
-            if encounters:
-                insert_query = """
-                    INSERT INTO encounters (
-                        zone_id, pokemon_id, encounter_method, rarity_tier,
-                        min_level, max_level, avg_level, probability_percent, generation
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                execute_batch(cursor, insert_query, encounters)
-    
-    conn.commit()
-    print(f"✓ {len(zone_id_map)} zonas y sus encuentros cargados")
-    return zone_id_map
+            DELETE FROM encounters
+            WHERE zone_id = (SELECT id FROM zones WHERE code = %s)
+        """, (zone_code,))
+        cursor.execute("DELETE FROM load_manifest WHERE path = %s", (path,))
+        conn.commit()
 
-def calculate_zone_distances(conn, zone_id_map):
-    """Calcula distancias entre zonas"""
+    # Las distancias dependen de las grillas: si cambia alguna hay que recalcularlas
+    maps_changed = 0
+    if os.path.isdir(matrices_dir):
+        for filename in sorted(os.listdir(matrices_dir)):
+            if filename.endswith(MATRIX_EXTENSIONS):
+                path = os.path.join(matrices_dir, filename)
+                changed, entry = file_state(path, manifest)
+                if entry != manifest.get(path):
+                    record_manifest(cursor, path, entry)
+                maps_changed += changed
+        conn.commit()
+
+    if reloaded:
+        report_rate('encounters', inserted, time.perf_counter() - start)
+        stats.report()
+    report_unmatched(unmatched)
+    print(f"✓ {reloaded} zonas recargadas, {len(removed)} eliminadas, "
+          f"{len(seen) - reloaded} sin cambios, {maps_changed} grillas modificadas")
+
+    cursor.execute("SELECT code, id FROM zones ORDER BY code")
+    zone_id_map = dict(cursor.fetchall())
+    return zone_id_map, bool(reloaded or removed or maps_changed)
+
+def calculate_zone_distances(conn, zone_id_map, matrices_dir=MATRICES_DIR, all_pairs=False,
+                             table='zone_distances'):
+    """
+    Calcula distancias reales en baldosas entre zonas vecinas a partir de las
+    grillas de map/matrices (ver map/zone_graph.py) y reemplaza `table`.
+    Con all_pairs también llena zone_distance_cache con el camino más corto
+    entre todo par de zonas conectadas. Devuelve la adyacencia calculada.
+    """
     print("\n📏 Calculando distancias entre zonas...")
-    
+
     cursor = conn.cursor()
-    zones_list = list(zone_id_map.items())
-    
-    distances = []
-    for i, (code1, id1) in enumerate(zones_list):
-        for j, (code2, id2) in enumerate(zones_list):
-            if i != j:
-                distance = abs(i - j) * 50
-                distances.append((id1, id2, distance))
-    
-    insert_query = """
-        INSERT INTO zone_distances (from_zone_id, to_zone_id, distance_tiles)
+    start = time.perf_counter()
+    adjacency, skipped = zone_adjacency(matrices_dir, set(zone_id_map))
+    for a, b in skipped:
+        print(f"⚠ Conexión sin camino transitable en las grillas: {a} <-> {b}")
+
+    distances = [(zone_id_map[a], zone_id_map[b], tiles) for (a, b), tiles in sorted(adjacency.items())]
+
+    insert_query = f"""
+        INSERT INTO {table} (from_zone_id, to_zone_id, distance_tiles)
         VALUES (%s, %s, %s)
-        ON CONFLICT (from_zone_id, to_zone_id) DO NOTHING
     """
-    
+
+    cursor.execute(f"DELETE FROM {table}")
     execute_batch(cursor, insert_query, distances)
+
+    if all_pairs:
+        cached = distance_cache_rows(zone_id_map, adjacency)
+        write_distance_cache(cursor, cached)
+
+    conn.commit()
+    report_rate(table, len(distances), time.perf_counter() - start)
+    print(f"✓ {len(distances)} distancias entre zonas vecinas calculadas")
+    if all_pairs:
+        print(f"✓ {len(cached)} pares en zone_distance_cache")
+    return adjacency
+
+def distance_cache_rows(zone_id_map, adjacency):
+    """Filas de zone_distance_cache: camino más corto entre todo par de zonas conectadas"""
+    return [(zone_id_map[a], zone_id_map[b], tiles)
+            for (a, b), tiles in sorted(all_pairs_distances(adjacency).items())]
+
+def write_distance_cache(cursor, rows):
+    """Reemplaza zone_distance_cache por `rows`; el commit queda a cargo de quien llama"""
+    ensure_distance_cache(cursor)
+    cursor.execute("DELETE FROM zone_distance_cache")
+    execute_batch(cursor, """
+        INSERT INTO zone_distance_cache (from_zone_id, to_zone_id, distance_tiles)
+        VALUES (%s, %s, %s)
+    """, rows)
+
+SWAP_TABLES = ('pokemon', 'encounters', 'zone_distances')
+
+def _staging(table):
+    return f"{table}_staging"
+
+def create_staging_tables(cursor):
+    """Tablas UNLOGGED con las columnas y defaults de las reales, sin índices ni constraints"""
+    for table in reversed(SWAP_TABLES):
+        cursor.execute(f"DROP TABLE IF EXISTS {_staging(table)}")
+    for table in SWAP_TABLES:
+        cursor.execute(f"CREATE UNLOGGED TABLE {_staging(table)} (LIKE {table} INCLUDING DEFAULTS)")
+
+def build_staging_indexes(cursor):
+    """
+    Replica sobre las tablas staging las constraints e índices de las reales,
+    leídos del catálogo, con el sufijo _staging. Las tablas pasan a LOGGED
+    antes de indexar, así la reescritura no arrastra índices.
+    """
+    constraints, indexes = [], []
+    for table in SWAP_TABLES:
+        cursor.execute("""
+            SELECT conname, contype, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+            ORDER BY conname
+        """, (table,))
+        constraints += [(table,) + row for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = 'public' AND i.tablename = %s
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexname::regclass)
+            ORDER BY i.indexname
+        """, (table,))
+        indexes += [(table,) + row for row in cursor.fetchall()]
+
+    for table in SWAP_TABLES:
+        cursor.execute(f"ALTER TABLE {_staging(table)} SET LOGGED")
+
+    # Primero PK/UNIQUE (las FKs las necesitan), luego índices y al final FKs
+    for table, name, kind, definition in constraints:
+        if kind != 'f':
+            cursor.execute(f"ALTER TABLE {_staging(table)} ADD CONSTRAINT {_staging(name)} {definition}")
+    for table, name, definition in indexes:
+        definition = definition.replace(f"INDEX {name} ON", f"INDEX {_staging(name)} ON", 1)
+        definition = definition.replace(f" ON public.{table} ", f" ON public.{_staging(table)} ", 1)
+        cursor.execute(definition)
+    for table, name, kind, definition in constraints:
+        if kind == 'f':
+            for target in SWAP_TABLES:
+                definition = definition.replace(f"REFERENCES {target}(", f"REFERENCES {_staging(target)}(")
+            cursor.execute(f"ALTER TABLE {_staging(table)} ADD CONSTRAINT {_staging(name)} {definition}")
+
+    for table in SWAP_TABLES:
+        cursor.execute(f"ANALYZE {_staging(table)}")
+    return [(table, name) for table, name, *_ in constraints], [(table, name) for table, name, _ in indexes]
+
+def _dependent_views(cursor):
+    """Vistas y vistas materializadas que dependen (directa o indirectamente) de SWAP_TABLES"""
+    cursor.execute("""
+        WITH RECURSIVE deps(oid, depth) AS (
+            SELECT r.ev_class, 1
+            FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+            WHERE d.refobjid = ANY(%s::regclass[]) AND r.ev_class <> d.refobjid
+            UNION
+            SELECT r.ev_class, deps.depth + 1
+            FROM deps
+            JOIN pg_depend d ON d.refobjid = deps.oid
+            JOIN pg_rewrite r ON r.oid = d.objid
+            WHERE r.ev_class <> deps.oid
+        )
+        SELECT c.relname, c.relkind, pg_get_viewdef(c.oid), obj_description(c.oid, 'pg_class'),
+               ARRAY(SELECT indexdef FROM pg_indexes WHERE tablename = c.relname ORDER BY indexname)
+        FROM (SELECT oid, MAX(depth) AS depth FROM deps GROUP BY oid) d
+        JOIN pg_class c ON c.oid = d.oid
+        ORDER BY d.depth, c.relname
+    """, (list(SWAP_TABLES),))
+    return cursor.fetchall()
+
+def swap_staging_tables(conn, constraints, indexes, distance_cache=None):
+    """
+    Reemplaza las tablas reales por las staging en una sola transacción:
+    renombra tablas, constraints e índices, conserva las secuencias y
+    comentarios y recrea las vistas que dependían de las tablas viejas. Con
+    `distance_cache` (filas de distance_cache_rows) zone_distance_cache se
+    reescribe en esa misma transacción, junto con las nuevas zone_distances.
+    """
+    cursor = conn.cursor()
+    views = _dependent_views(cursor)
+
+    cursor.execute(
+        "SELECT relname, obj_description(oid, 'pg_class') FROM pg_class WHERE relname = ANY(%s)",
+        (list(SWAP_TABLES),))
+    comments = dict(cursor.fetchall())
+
+    sequences = {}
+    for table in SWAP_TABLES:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+        seq = cursor.fetchone()[0]
+        if seq:
+            # Si no, el DROP de la tabla vieja se llevaría la secuencia
+            cursor.execute(f"ALTER SEQUENCE {seq} OWNED BY {_staging(table)}.id")
+            sequences[table] = seq
+
+    for table in reversed(SWAP_TABLES):
+        cursor.execute(f"DROP TABLE {table} CASCADE")
+    for table in SWAP_TABLES:
+        cursor.execute(f"ALTER TABLE {_staging(table)} RENAME TO {table}")
+        if comments.get(table):
+            cursor.execute(f"COMMENT ON TABLE {table} IS %s", (comments[table],))
+    for table, name in constraints:
+        cursor.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {_staging(name)} TO {name}")
+    for table, name in indexes:
+        cursor.execute(f"ALTER INDEX {_staging(name)} RENAME TO {name}")
+
+    for name, kind, definition, comment, view_indexes in views:
+        if kind == 'm':
+            cursor.execute(f"CREATE MATERIALIZED VIEW {name} AS {definition.rstrip().rstrip(';')} WITH DATA")
+            object_type = 'MATERIALIZED VIEW'
+        else:
+            cursor.execute(f"CREATE VIEW {name} AS {definition}")
+            object_type = 'VIEW'
+        for index_def in view_indexes:
+            cursor.execute(index_def)
+        if comment:
+            cursor.execute(f"COMMENT ON {object_type} {name} IS %s", (comment,))
+        if kind == 'm':
+            cursor.execute(f"ANALYZE {name}")
+
+    if distance_cache is not None:
+        write_distance_cache(cursor, distance_cache)
     conn.commit()
-    print(f"✓ {len(distances)} distancias calculadas")
+
+def drop_staging_tables(conn):
+    conn.rollback()
+    cursor = conn.cursor()
+    for table in reversed(SWAP_TABLES):
+        cursor.execute(f"DROP TABLE IF EXISTS {_staging(table)}")
+    conn.commit()
+
+def load_swap(conn, csv_path='Pokedex_Limpiado.csv', locations_dir='locations/csv',
+              matrices_dir=MATRICES_DIR, all_pairs=False):
+    """
+    Recarga completa sin ventana de datos a medias para los lectores:
+
+    1. COPY a tablas staging UNLOGGED sin índices (las zonas se actualizan
+       en su lugar antes, para que los ids sigan estables);
+    2. construcción de constraints e índices una sola vez al final;
+    3. validación de conteos contra lo que se envió;
+    4. intercambio con las tablas reales en una única transacción, que con
+       all_pairs también reescribe zone_distance_cache.
+    """
+    print("\n🔀 Carga en tablas staging...")
+    cursor = conn.cursor()
+    start = time.perf_counter()
+
+    zone_files = []
+    zone_id_map = {}
+    for zone_code, zone_name, zone_type, filepath in iter_zone_files(locations_dir):
+        zone_id_map[zone_code] = upsert_zone(cursor, zone_code, zone_name, zone_type)
+        zone_files.append((zone_id_map[zone_code], filepath))
+    conn.commit()
+
+    try:
+        create_staging_tables(cursor)
+
+        expected = {}
+        t0 = time.perf_counter()
+        stats = StageStats(_staging('pokemon'))
+        sink = PostgresSink(cursor, _staging('pokemon'), POKEMON_COLUMNS, 'copy')
+        expected['pokemon'] = stats.sink(sink, pokemon_rows(csv_path, stats))
+        report_rate(_staging('pokemon'), expected['pokemon'], time.perf_counter() - t0)
+        stats.report()
+
+        t0 = time.perf_counter()
+        unmatched = Counter()
+        pokemon_index = build_pokemon_index(cursor, _staging('pokemon'))
+        stats = StageStats(_staging('encounters'))
+        sink = PostgresSink(cursor, _staging('encounters'), ENCOUNTER_COLUMNS, 'copy')
+        expected['encounters'] = stats.sink(sink, encounter_rows(zone_files, pokemon_index, unmatched, stats))
+        report_rate(_staging('encounters'), expected['encounters'], time.perf_counter() - t0)
+        stats.report()
+        report_unmatched(unmatched)
+        conn.commit()
+
+        # zone_distance_cache no tiene staging: se reescribe dentro del intercambio
+        adjacency = calculate_zone_distances(conn, zone_id_map, matrices_dir, table=_staging('zone_distances'))
+        cached = distance_cache_rows(zone_id_map, adjacency) if all_pairs else None
+        cursor.execute(f"SELECT COUNT(*) FROM {_staging('zone_distances')}")
+        expected['zone_distances'] = cursor.fetchone()[0]
+
+        t0 = time.perf_counter()
+        constraints, indexes = build_staging_indexes(cursor)
+        conn.commit()
+        print(f"✓ Índices y constraints construidos en {time.perf_counter() - t0:.3f}s")
+
+        for table in SWAP_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {_staging(table)}")
+            count = cursor.fetchone()[0]
+            if count != expected[table] or (table != 'zone_distances' and count == 0):
+                raise RuntimeError(f"Validación fallida en {_staging(table)}: "
+                                   f"{count} filas, se esperaban {expected[table]}")
+        print("✓ Conteos validados: " + ", ".join(f"{t}={expected[t]}" for t in SWAP_TABLES))
+
+        t0 = time.perf_counter()
+        swap_staging_tables(conn, constraints, indexes, cached)
+        print(f"✓ Tablas intercambiadas en {time.perf_counter() - t0:.3f}s "
+              f"(total {time.perf_counter() - start:.3f}s)")
+        if cached is not None:
+            print(f"✓ {len(cached)} pares en zone_distance_cache")
+    except Exception:
+        drop_staging_tables(conn)
+        raise
+
+    return zone_id_map
+
+def refresh_zone_ev_rates(conn):
+    """
+    Refresca zone_ev_rates_mv. Si ya tiene datos se usa CONCURRENTLY para no
+    bloquear a los lectores; la primera vez hace falta un REFRESH normal.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = 'zone_ev_rates_mv'")
+    row = cursor.fetchone()
+    if row is None:
+        print("⚠ zone_ev_rates_mv no existe (esquema anterior); se omite el refresco")
+        return
+
+    start = time.perf_counter()
+    concurrently = 'CONCURRENTLY ' if row[0] else ''
+    cursor.execute(f"REFRESH MATERIALIZED VIEW {concurrently}zone_ev_rates_mv")
+    conn.commit()
+    print(f"✓ zone_ev_rates_mv refrescada en {time.perf_counter() - start:.3f}s")
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Carga Pokémon, zonas y encuentros a PostgreSQL.")
+    ap.add_argument("--mode", choices=("batch", "copy"), default="batch",
+                    help="batch: execute_batch (default); copy: COPY ... FROM STDIN en streaming.")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Procesos/conexiones para cargar zonas en paralelo (0 = núcleos disponibles).")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Recarga solo los CSVs cuyo hash cambió desde la última carga (load_manifest).")
+    ap.add_argument("--swap", action="store_true",
+                    help="Carga en tablas staging UNLOGGED y las intercambia con las reales en una transacción.")
+    ap.add_argument("--all-pairs", action="store_true",
+                    help="Además de las aristas entre zonas vecinas, llena zone_distance_cache con todos los pares.")
+    ap.add_argument("--sink", choices=("postgres", "dry-run", "file"), default="postgres",
+                    help="postgres (default); dry-run: solo cuenta filas; file: CSVs normalizados en --out-dir.")
+    ap.add_argument("--out-dir", default="normalized",
+                    help="Directorio de salida para --sink file (default: normalized).")
+    ap.add_argument("--pokedex", default=None,
+                    help=f"Pokédex a cargar (default: {POKEDEX_PARQUET} si existe, hay pyarrow y no es más viejo que {POKEDEX_CSV}; si no, el CSV).")
+    return ap.parse_args()
 
 def main():
-    print("🚀 Iniciando carga de datos...")
-    
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    pokedex = args.pokedex or default_pokedex()
+    print(f"🚀 Iniciando carga de datos (modo {args.mode}, Pokédex {pokedex})...")
+
+    if args.sink != 'postgres':
+        load_offline(args.sink, csv_path=pokedex, out_dir=args.out_dir)
+        print("\n✅ Pipeline completado")
+        return
+
     if not wait_for_db():
         print("❌ No se pudo conectar a la base de datos")
         return
-    
+
     try:
         conn = psycopg2.connect(**DB_CONFIG)
-        
-        load_pokemon_data(conn)
-        zone_id_map = load_zones_and_encounters(conn)
-        
-        if zone_id_map:
-            calculate_zone_distances(conn, zone_id_map)
-        
+
+        if args.swap:
+            zone_id_map = load_swap(conn, csv_path=pokedex, all_pairs=args.all_pairs)
+            record_full_load(conn, csv_path=pokedex)
+            refresh_zone_ev_rates(conn)
+        elif args.incremental:
+            zone_id_map, changed = load_incremental(conn, csv_path=pokedex, mode=args.mode)
+            if changed:
+                calculate_zone_distances(conn, zone_id_map, all_pairs=args.all_pairs)
+                refresh_zone_ev_rates(conn)
+        else:
+            load_pokemon_data(conn, pokedex, mode=args.mode)
+            zone_id_map = load_zones_and_encounters(conn, mode=args.mode, workers=workers)
+
+            if zone_id_map:
+                calculate_zone_distances(conn, zone_id_map, all_pairs=args.all_pairs)
+                record_full_load(conn, csv_path=pokedex)
+
+            refresh_zone_ev_rates(conn)
+
         conn.close()
         print("\n✅ Carga de datos completada exitosamente")
-        
+
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Pipeline de carga compartido por load_data.py y db/init/02_load_data.py
+
+Cada etapa es un generador que consume la anterior, así que ningún CSV se
+materializa completo:
+
+    leer CSV -> parsear (niveles, rareza, tipos) -> resolver ids -> sumidero
+
+Los sumideros son Postgres (COPY o execute_batch), un contador para corridas
+en seco y un archivo CSV. `StageStats` envuelve cada etapa y mide filas y
+tiempo propio, para perfilar el parseo en un solo lugar.
+
+El Pokédex también se puede leer del Parquet de clean_dataset.py, que ya trae
+cada columna con su tipo y se salta el parseo.
+"""
+
+import os
+import csv
+import time
+import unicodedata
+from psycopg2.extras import execute_batch
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:     # sin pyarrow el Pokédex se lee del CSV
+    pq = None
+
+POKEMON_COLUMNS = (
+    'pokedex_number', 'name', 'generation', 'height', 'weight',
+    'type1', 'type2', 'ability1', 'ability2', 'ability_hidden',
+    'gender_male', 'gender_female', 'gender_unknown',
+    'capture_rate', 'base_experience', 'experience_type', 'category',
+    'base_hp', 'base_attack', 'base_defense', 'base_sp_attack', 'base_sp_defense', 'base_speed', 'base_total',
+    'ev_hp', 'ev_attack', 'ev_defense', 'ev_sp_attack', 'ev_sp_defense', 'ev_speed'
+)
+
+# Columnas del Pokédex limpio (CSV o Parquet) en el orden de POKEMON_COLUMNS
+POKEDEX_COLUMNS = (
+    'No', 'Name', 'Generation', 'Height', 'Weight',
+    'Type1', 'Type2', 'Ability1', 'Ability2', 'Ability_Hidden',
+    'Gender_Male', 'Gender_Female', 'Gender_Unknown',
+    'Get_Rate', 'Base_Experience', 'Experience_Type', 'Category',
+    'HP', 'Attack', 'Defense', 'SP_Attack', 'SP_Defense', 'Speed', 'Total',
+    'E_HP', 'E_Attack', 'E_Defense', 'E_SP_Attack', 'E_SP_Defense', 'E_Speed'
+)
+
+ENCOUNTER_COLUMNS = (
+    'zone_id', 'pokemon_id', 'encounter_method', 'rarity_tier',
+    'min_level', 'max_level', 'avg_level', 'probability_percent', 'generation'
+)
+
+RARITY_MAP = {
+    'Common': 40.0,
+    'Uncommon': 20.0,
+    'Rare': 10.0,
+    'Very Rare': 5.0
+}
+
+REGIONAL_PREFIXES = ('alolan', 'galarian', 'hisuian', 'paldean')
+
+def report_rate(table, count, elapsed):
+    """Imprime filas/seg de una tabla para comparar modos de carga"""
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print(f"  ⏱ {table}: {count} filas en {elapsed:.3f}s ({rate:,.0f} filas/s)")
+
+# ---------------------------------------------------------------------------
+# Contadores por etapa
+# ---------------------------------------------------------------------------
+
+class StageStats:
+    """
+    Filas y tiempo de cada etapa de una cadena de generadores. El tiempo
+    medido al pedir filas a una etapa incluye el de las anteriores, así que
+    el tiempo propio se obtiene restando el de la etapa previa. Varias
+    pasadas con el mismo nombre de etapa (una por zona, por ejemplo) se
+    acumulan en la misma entrada.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}   # etapa -> [filas, segundos acumulados], en orden de la cadena
+
+    def _entry(self, stage):
+        return self.stages.setdefault(stage, [0, 0.0])
+
+    def track(self, stage, rows):
+        """Envuelve el generador `rows` contando filas y tiempo de la etapa"""
+        # La entrada se crea ya, no al primer next(), para respetar el orden de la cadena
+        return self._timed(self._entry(stage), iter(rows))
+
+    @staticmethod
+    def _timed(entry, it):
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                row = next(it)
+            except StopIteration:
+                entry[1] += clock() - start
+                return
+            entry[1] += clock() - start
+            entry[0] += 1
+            yield row
+
+    def sink(self, sink, rows):
+        """Vacía `rows` en el sumidero midiendo su tiempo; devuelve filas escritas"""
+        start = time.perf_counter()
+        count = sink.consume(rows)
+        entry = self._entry(sink.name)
+        entry[0] += count
+        entry[1] += time.perf_counter() - start
+        return count
+
+    def merge(self, stages):
+        """Suma los contadores de otro StageStats (p. ej. los de un proceso del pool)"""
+        for stage, (count, seconds) in stages.items():
+            entry = self._entry(stage)
+            entry[0] += count
+            entry[1] += seconds
+
+    def report(self):
+        print(f"  📈 {self.name}:")
+        previous = 0.0
+        for stage, (count, inclusive) in self.stages.items():
+            own = max(inclusive - previous, 0.0)
+            rate = count / own if own > 0 else float('inf')
+            print(f"     {stage:<10} {count:>9} filas {own:>8.3f}s {rate:>14,.0f} filas/s")
+            previous = inclusive
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+def read_csv(path):
+    """Filas del CSV como diccionarios, de a una"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+def zone_fields(zone_code):
+    """(nombre, tipo) de una zona: 'kanto-route-1' -> ('Route 1', 'Route')"""
+    zone_name = zone_code.replace('kanto-', '').replace('-', ' ').title()
+    zone_type = 'Route' if 'route' in zone_code else 'Location'
+    return zone_name, zone_type
+
+def read_parquet_pokemon(path, batch_size=65536):
+    """
+    Tuplas en el orden de POKEMON_COLUMNS desde el Parquet de clean_dataset.py,
+    por lotes. Los tipos vienen del archivo (nulos como None), así que no hay
+    conversión campo por campo como en parse_pokemon.
+    """
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=list(POKEDEX_COLUMNS)):
+        yield from zip(*(batch.column(name).to_pylist() for name in POKEDEX_COLUMNS))
+
+def iter_zone_files(locations_dir):
+    """Genera (zone_code, zone_name, zone_type, filepath) por cada CSV de zona"""
+    for filename in sorted(os.listdir(locations_dir)):
+        if not filename.endswith('.csv'):
+            continue
+
+        zone_code = filename.replace('.csv', '')
+        yield (zone_code,) + zone_fields(zone_code) + (os.path.join(locations_dir, filename),)
+
+def read_zone_csvs(zone_files):
+    """Filas de varios CSV de zona como (zone_key, fila) para [(zone_key, filepath)]"""
+    for zone_key, filepath in zone_files:
+        for row in read_csv(filepath):
+            yield zone_key, row
+
+# ---------------------------------------------------------------------------
+# Parseo y normalización
+# ---------------------------------------------------------------------------
+
+def parse_pokemon(rows):
+    """Filas del Pokédex -> tuplas en el orden de POKEMON_COLUMNS"""
+    def clean_val(val):
+        return None if val == '' else val
+
+    for row in rows:
+        yield (
+            int(row['No']),
+            row['Name'],
+            int(row['Generation']),
+            float(row['Height']) if row['Height'] else None,
+            float(row['Weight']) if row['Weight'] else None,
+            row['Type1'],
+            clean_val(row['Type2']),
+            clean_val(row['Ability1']),
+            clean_val(row['Ability2']),
+            clean_val(row['Ability_Hidden']),
+            float(row['Gender_Male']) if row['Gender_Male'] else None,
+            float(row['Gender_Female']) if row['Gender_Female'] else None,
+            float(row['Gender_Unknown']) if row['Gender_Unknown'] else None,
+            int(row['Get_Rate']) if row['Get_Rate'] else None,
+            int(row['Base_Experience']) if row['Base_Experience'] else None,
+            clean_val(row['Experience_Type']),
+            clean_val(row['Category']),
+            int(row['HP']),
+            int(row['Attack']),
+            int(row['Defense']),
+            int(row['SP_Attack']),
+            int(row['SP_Defense']),
+            int(row['Speed']),
+            int(row['Total']),
+            int(row['E_HP']),
+            int(row['E_Attack']),
+            int(row['E_Defense']),
+            int(row['E_SP_Attack']),
+            int(row['E_SP_Defense']),
+            int(row['E_Speed'])
+        )
+
+def parse_level(nivel_str):
+    """Convierte '2-5' o '7' en (min, max); None si el nivel no es válido"""
+    nivel_str = nivel_str.strip()
+
+    # Saltar si no hay nivel válido
+    if not nivel_str or nivel_str in ['—', '-', 'N/A', '']:
+        return None
+
+    try:
+        if '-' in nivel_str:
+            parts = nivel_str.split('-')
+            return int(parts[0].strip()), int(parts[1].strip())
+        level = int(nivel_str)
+        return level, level
+    except (ValueError, IndexError):
+        # Si no se puede parsear, saltar este registro
+        return None
+
+def parse_encounters(rows):
+    """
+    (zone_key, fila) -> (zone_key, nombre_pokemon, método, rareza, min, max,
+    promedio, probabilidad, generación). Descarta filas sin nivel válido.
+    """
+    for zone_key, row in rows:
+        levels = parse_level(row['Nivel'])
+        if levels is None:
+            continue
+        min_level, max_level = levels
+        avg_level = (min_level + max_level) / 2.0
+
+        rarity = row['Rareza'].strip()
+        probability = RARITY_MAP.get(rarity, 10.0)
+
+        yield (
+            zone_key,
+            row['Pokémon'].strip(),
+            row['Método'].strip(),
+            rarity,
+            min_level,
+            max_level,
+            avg_level,
+            probability,
+            row.get('Generación', 'Generation 3')
+        )
+
+# ---------------------------------------------------------------------------
+# Resolución de ids
+# ---------------------------------------------------------------------------
+
+def normalize_name(name):
+    """
+    Clave de comparación para nombres de Pokémon: sin acentos, espacios ni
+    puntuación y con los símbolos de género como letra
+    ('Nidoran♀' y 'Nidoran F' -> 'nidoranf', 'Mr. Mime' -> 'mrmime').
+    """
+    name = name.replace('♀', 'f').replace('♂', 'm')
+    name = unicodedata.normalize('NFKD', name)
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+def index_pokemon(pairs):
+    """Índice nombre normalizado -> id a partir de pares (id, nombre)"""
+    index = {}
+    regional = {}
+    for pokemon_id, name in pairs:
+        index[normalize_name(name)] = pokemon_id
+        # 'Paldean Wooper' también responde a 'Wooper' si no existe la forma base
+        prefix, _, base = name.partition(' ')
+        if base and prefix.lower() in REGIONAL_PREFIXES:
+            regional.setdefault(normalize_name(base), pokemon_id)
+    for key, pokemon_id in regional.items():
+        index.setdefault(key, pokemon_id)
+    return index
+
+def build_pokemon_index(cursor, table='pokemon'):
+    """Índice nombre normalizado -> id con una sola consulta a `table`"""
+    cursor.execute(f"SELECT id, name FROM {table}")
+    return index_pokemon(cursor.fetchall())
+
+def resolve_pokemon_ids(rows, pokemon_index, unmatched):
+    """
+    Reemplaza el nombre del Pokémon (segunda columna) por su id. Las filas
+    sin coincidencia se descartan y se cuentan en `unmatched` por nombre.
+    """
+    for row in rows:
+        pokemon_id = pokemon_index.get(normalize_name(row[1]))
+        if pokemon_id is None:
+            unmatched[row[1]] += 1
+            continue
+        yield (row[0], pokemon_id) + row[2:]
+
+def report_unmatched(unmatched):
+    """Informa los encuentros descartados por no encontrar al Pokémon"""
+    if not unmatched:
+        return
+    names = ', '.join(f"{name} ({n})" for name, n in unmatched.most_common())
+    print(f"⚠ {sum(unmatched.values())} encuentros sin Pokémon asociado: {names}")
+
+# ---------------------------------------------------------------------------
+# Cadenas completas
+# ---------------------------------------------------------------------------
+
+def pokemon_rows(csv_path, stats=None):
+    """Tuplas de Pokémon del CSV o Parquet, con contadores en `stats` si se pasa"""
+    if csv_path.endswith('.parquet'):
+        rows = read_parquet_pokemon(csv_path)
+        return rows if stats is None else stats.track('leer', rows)
+    if stats is None:
+        return parse_pokemon(read_csv(csv_path))
+    rows = stats.track('leer', read_csv(csv_path))
+    return stats.track('parsear', parse_pokemon(rows))
+
+def normalize_encounters(rows, pokemon_index, unmatched, stats=None):
+    """
+    Encuentros listos para insertar a partir de (zone_key, fila) con las
+    columnas de los CSV de zona, vengan de un archivo o del scraper.
+    """
+    if stats is None:
+        return resolve_pokemon_ids(parse_encounters(rows), pokemon_index, unmatched)
+    rows = stats.track('parsear', parse_encounters(rows))
+    return stats.track('resolver', resolve_pokemon_ids(rows, pokemon_index, unmatched))
+
+def encounter_rows(zone_files, pokemon_index, unmatched, stats=None):
+    """Encuentros listos para insertar de [(zone_key, filepath)]"""
+    if stats is None:
+        return normalize_encounters(read_zone_csvs(zone_files), pokemon_index, unmatched)
+    rows = stats.track('leer', read_zone_csvs(zone_files))
+    return normalize_encounters(rows, pokemon_index, unmatched, stats)
+
+# ---------------------------------------------------------------------------
+# Sumideros
+# ---------------------------------------------------------------------------
+
+def _copy_value(val):
+    """Serializa un valor al formato texto de COPY"""
+    if val is None:
+        return '\\N'
+    if isinstance(val, str):
+        return (val.replace('\\', '\\\\').replace('\t', '\\t')
+                   .replace('\n', '\\n').replace('\r', '\\r'))
+    return str(val)
+
+class CopyStream:
+    """
+    Objeto tipo archivo que alimenta COPY ... FROM STDIN desde un generador
+    de tuplas. Solo mantiene en memoria el bloque que psycopg2 pide en cada
+    read(), nunca la lista completa de filas.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buf = bytearray()
+        self.count = 0
+
+    def _next_line(self):
+        row = next(self._rows, None)
+        if row is None:
+            return None
+        self.count += 1
+        return ('\t'.join(_copy_value(v) for v in row) + '\n').encode('utf-8')
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            line = self._next_line()
+            if line is None:
+                break
+            self._buf += line
+        if size < 0:
+            size = len(self._buf)
+        chunk = bytes(self._buf[:size])
+        del self._buf[:size]
+        return chunk
+
+def copy_rows(cursor, table, columns, rows):
+    """Envía las filas del generador con COPY y devuelve cuántas se copiaron"""
+    stream = CopyStream(rows)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=65536
+    )
+    return stream.count
+
+def _counted(rows, counter):
+    for row in rows:
+        counter[0] += 1
+        yield row
+
+class PostgresSink:
+    """
+    Inserta en `table` con COPY (mode='copy') o execute_batch (mode='batch').
+    Con `on_conflict`, COPY pasa por una tabla temporal y un INSERT ... SELECT,
+    porque COPY no admite ON CONFLICT.
+    """
+    name = 'postgres'
+
+    def __init__(self, cursor, table, columns, mode='batch', on_conflict=''):
+        self.cursor = cursor
+        self.table = table
+        self.columns = columns
+        self.mode = mode
+        self.on_conflict = on_conflict
+
+    def consume(self, rows):
+        cols = ', '.join(self.columns)
+        if self.mode == 'copy':
+            if not self.on_conflict:
+                return copy_rows(self.cursor, self.table, self.columns, rows)
+            temp = f"{self.table}_copy"
+            self.cursor.execute(f"DROP TABLE IF EXISTS {temp}")
+            self.cursor.execute(f"""
+                CREATE TEMP TABLE {temp} (LIKE {self.table} INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+            count = copy_rows(self.cursor, temp, self.columns, rows)
+            self.cursor.execute(f"""
+                INSERT INTO {self.table} ({cols})
+                SELECT {cols} FROM {temp}
+                {self.on_conflict}
+            """)
+            return count
+
+        counter = [0]
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        execute_batch(self.cursor, f"""
+            INSERT INTO {self.table} ({cols}) VALUES ({placeholders}) {self.on_conflict}
+        """, _counted(rows, counter))
+        return counter[0]
+
+class CountSink:
+    """Corrida en seco: recorre todo el pipeline y solo cuenta filas"""
+    name = 'contar'
+
+    def consume(self, rows):
+        count = 0
+        for _ in rows:
+            count += 1
+        return count
+
+class CsvSink:
+    """Escribe las filas normalizadas a un CSV con encabezado `columns`"""
+    name = 'archivo'
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+
+    def consume(self, rows):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        count = 0
+        with open(self.path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark y comparación dorada de los parsers de scraper.py sobre páginas
+guardadas: por defecto las de fixtures/pages, que se comparan contra sus CSV
+esperados en fixtures/csv; también una carpeta de .html (--pages) o la caché
+HTTP del scraper (--cache). Por página corre parse_page_bs4 y parse_page_lxml,
+exige que el CSV que saldría de cada uno sea idéntico y suma el mejor tiempo
+de cada parser. Con --golden compara además contra los CSV de esa carpeta.
+
+    python bench_parse.py
+    python bench_parse.py --pages guardadas/ --repeat 5
+    python bench_parse.py --cache .http_cache --golden csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from scraper import CACHE_DIR, CSV_COLUMNS, page_rows, parse_page_bs4, parse_page_lxml, lxml
+
+PARSERS = (("bs4", parse_page_bs4), ("lxml", parse_page_lxml))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_PAGES = os.path.join(FIXTURES_DIR, "pages")
+FIXTURE_CSV = os.path.join(FIXTURES_DIR, "csv")
+
+
+def cached_pages(cache_dir):
+    """[(nombre, html)] de la caché HTTP; el nombre es el último tramo de la URL"""
+    pages = []
+    if not os.path.isdir(cache_dir):
+        return pages
+    for filename in sorted(os.listdir(cache_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(cache_dir, filename), encoding="utf-8") as f:
+            url = json.load(f)["url"]
+        with open(os.path.join(cache_dir, filename[:-len(".json")] + ".html"), encoding="utf-8") as f:
+            pages.append((url.rstrip("/").split("/")[-1], f.read()))
+    return pages
+
+
+def saved_pages(pages_dir):
+    pages = []
+    if not os.path.isdir(pages_dir):
+        return pages
+    for filename in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, filename), encoding="utf-8") as f:
+            pages.append((os.path.splitext(filename)[0], f.read()))
+    return pages
+
+
+def csv_text(data):
+    """Texto del CSV que scraper.write_csv escribiría para `data` (None si no lo escribe)"""
+    if not data:
+        return None
+    out = io.StringIO(newline="")
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    writer.writerows(page_rows(data))
+    return out.getvalue()
+
+
+def best_time(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compara parse_page_bs4 y parse_page_lxml sobre páginas guardadas.")
+    ap.add_argument("--pages", default=FIXTURE_PAGES, help="Carpeta de .html guardados (default: fixtures/pages).")
+    ap.add_argument("--cache", nargs="?", const=CACHE_DIR,
+                    help=f"Usa la caché HTTP del scraper en lugar de --pages (sin valor: {CACHE_DIR}).")
+    ap.add_argument("--golden", help="Carpeta de CSV esperados (default: fixtures/csv con las páginas de fixtures).")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por página; se toma la mejor.")
+    args = ap.parse_args()
+    if lxml is None:
+        ap.error("lxml no está instalado")
+
+    source = args.cache or args.pages
+    pages = cached_pages(args.cache) if args.cache else saved_pages(args.pages)
+    if not pages:
+        print(f"⚠ No hay páginas guardadas en {source}")
+        return
+    if args.golden is None and not args.cache and os.path.abspath(args.pages) == FIXTURE_PAGES:
+        args.golden = FIXTURE_CSV
+    totals = {name: 0.0 for name, _ in PARSERS}
+    checked = 0
+    for name, html in pages:
+        outputs = {}
+        for parser_name, parser in PARSERS:
+            t, data = best_time(parser, html, args.repeat)
+            totals[parser_name] += t
+            outputs[parser_name] = csv_text(data)
+        if outputs["bs4"] != outputs["lxml"]:
+            raise AssertionError(f"{name}: el CSV de lxml no coincide con el de bs4")
+        if args.golden:
+            # Sin secciones gen3 el scraper no escribe CSV: tampoco debe haber uno esperado
+            golden = os.path.join(args.golden, name + ".csv")
+            expected = None
+            if os.path.exists(golden):
+                with open(golden, newline="", encoding="utf-8") as f:
+                    expected = f.read()
+            if expected != outputs["lxml"]:
+                raise AssertionError(f"{name}: el CSV no coincide con {args.golden}")
+            checked += 1
+
+    size = sum(len(html) for _, html in pages) / 1e6
+    print(f"✓ {len(pages)} páginas ({size:.1f} MB) con CSV idéntico en bs4 y lxml"
+          + (f", {checked} iguales a {os.path.relpath(args.golden)}" if args.golden else ""))
+    for parser_name, _ in PARSERS:
+        t = totals[parser_name]
+        print(f"  {parser_name:<5} {t*1e3:>8.1f} ms  ({t / len(pages) * 1e3:.2f} ms/página)")
+    print(f"  lxml {totals['bs4'] / totals['lxml']:.1f}x más rápido")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,56 @@
 #!/usr/bin/env python3
+"""
+Scraper de encuentros de Kanto (FireRed) desde pokemondb.
+
+Las páginas se bajan en un pool de hilos que comparte una requests.Session
+(conexiones keep-alive), un token bucket que limita los pedidos por segundo
+al host y reintentos con backoff exponencial; cada página se parsea y se
+escribe en csv/ apenas llega, mientras las demás siguen en vuelo.
+
+Con --sink postgres cada página, apenas se parsea, se normaliza con
+load_pipeline (niveles, rareza -> probabilidad, ids de Pokémon) y reemplaza
+los encuentros de su zona en la base en una transacción, igual que
+load_data.py --incremental; el CSV pasa a ser opcional (--sink both).
+
+Las respuestas quedan en una caché en disco (.http_cache/) con su ETag y
+Last-Modified, que se mandan como GET condicional en la siguiente corrida:
+si el servidor responde 304 y ya está su CSV, la página no se vuelve a parsear
+ni escribir. Con --sink postgres/both una página con 304 se parsea igual desde
+la caché y se carga: que la caché esté al día no dice nada de la base.
+Con --replay se parsea solo desde la caché, sin tocar la red.
+
+El parseo (parse_page) recorre el documento una sola vez con lxml y lee solo
+las filas con columna FR; sin lxml instalado se usa el parser original con
+BeautifulSoup (parse_page_bs4). bench_parse.py compara ambos.
+
+    python scraper.py
+    python scraper.py --workers 8 --rate 2
+    python scraper.py --base http://localhost:8000    # páginas guardadas servidas localmente
+    python scraper.py --replay                        # reparsea la caché (p. ej. tras tocar parse_page)
+    python scraper.py --sink postgres                 # zonas directo a la base, sin CSV
+"""
+import argparse
+import hashlib
+import json
 import os
+import sys
+import threading
+from collections import Counter
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 import csv
 import re
 
+try:
+    import lxml.html
+except ImportError:     # sin lxml queda parse_page_bs4
+    lxml = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE = "https://pokemondb.net"
 targets = [
     "/location/kanto-berry-forest",
@@ -90,7 +134,16 @@ targets = [
     "/location/kanto-water-labyrinth",
     "/location/kanto-water-path"
 ]
-DELAY = 5.0
+RATE = 1.0          # pedidos por segundo al host
+WORKERS = 4         # pedidos en vuelo a la vez
+RETRIES = 3
+BACKOFF = 2.0       # segundos; se duplica en cada reintento
+RETRY_STATUS = {429, 500, 502, 503, 504}
+CSV_COLUMNS = ['Pokémon', 'Rareza', 'Nivel', 'Método', 'Generación']
+FR_CLASS = "cell-loc-game-FR3"
+SKIP_CLASSES = {"cell-loc-game-LG3", "cell-loc-game-blank", FR_CLASS}
+CACHE_DIR = ".http_cache"
+UNCHANGED = "sin cambios"   # fetch_request: el servidor respondió 304
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0",
@@ -98,27 +151,137 @@ HEADERS = {
 }
 
 
-def fetch_request(path: str, idx: int):
-    url = urljoin(BASE, path)
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-    except requests.RequestException as e:
-        print(f"[{idx}] ERROR al conectar {url}: {e}")
-        return False
+class TokenBucket:
+    """Límite de tasa compartido entre hilos: `rate` pedidos/s con ráfagas de hasta `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpCache:
+    """
+    Caché de respuestas por URL: <sha256>.html con el cuerpo y <sha256>.json
+    con la URL, ETag y Last-Modified. Cada URL tiene sus propios archivos, así
+    que los hilos no se pisan; las escrituras son atómicas (tmp + os.replace).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+        return key + ".json", key + ".html"
 
-    if resp.status_code != 200:
-        print(f"[{idx}] ERROR STATUS {resp.status_code} para {url}")
-        return False
+    def get(self, url):
+        """{'url', 'etag', 'last_modified', 'body'} o None si la URL no está en caché"""
+        meta_path, body_path = self._paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(body_path, encoding="utf-8") as f:
+            entry["body"] = f.read()
+        return entry
 
-    print(f"[{idx}] STATUS {resp.status_code} para {url}")
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since para la versión guardada de `url`"""
+        meta_path, _ = self._paths(url)
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path, encoding="utf-8") as f:
+            entry = json.load(f)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    def put(self, url, resp):
+        meta_path, body_path = self._paths(url)
+        meta = {"url": url, "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified")}
+        # Primero el cuerpo: un .json sin .html no se usa
+        for path, content in ((body_path, resp.text), (meta_path, json.dumps(meta))):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+
+def make_session(workers=WORKERS):
+    """Session con HEADERS y un pool de conexiones del tamaño del pool de hilos"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def retry_delay(resp, attempt, backoff):
+    """Espera antes del reintento `attempt`: Retry-After si viene en segundos, si no backoff·2^n"""
+    retry_after = resp.headers.get("Retry-After", "") if resp is not None else ""
+    if retry_after.isdigit():
+        return float(retry_after)
+    return backoff * 2 ** attempt
+
+
+def fetch(session, url, bucket, idx, headers=None, retries=RETRIES, backoff=BACKOFF):
+    """
+    GET con límite de tasa. Reintenta errores de conexión y los status de
+    RETRY_STATUS; cualquier otro status distinto de 200/304 falla de una vez.
+    Devuelve la respuesta o None.
+    """
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        resp = None
+        try:
+            resp = session.get(url, headers=headers, timeout=15)
+        except requests.RequestException as e:
+            problem = f"ERROR al conectar {url}: {e}"
+        else:
+            if resp.status_code in (200, 304):
+                print(f"[{idx}] STATUS {resp.status_code} para {url}")
+                return resp
+            problem = f"ERROR STATUS {resp.status_code} para {url}"
+            if resp.status_code not in RETRY_STATUS:
+                break
+        if attempt < retries:
+            delay = retry_delay(resp, attempt, backoff)
+            print(f"[{idx}] {problem}; reintento {attempt + 1}/{retries} en {delay:.1f}s")
+            time.sleep(delay)
+    print(f"[{idx}] {problem}")
+    return None
+
+
+def parse_page_bs4(html):
+    """Tablas FR de las secciones gen3: [{'h3', 'table', 'generation'}], o None si no hay gen3"""
+    soup = BeautifulSoup(html, "html.parser")
 
     h2_gen3_list = soup.find_all("h2", id=re.compile(r"^gen3"))
 
     if not h2_gen3_list:
-        print(f"[{idx}] No se encontró ningún <h2 id='gen3...'> en {url}")
-        return
+        return None
 
     results = []
     for h2_gen3 in h2_gen3_list:
@@ -155,43 +318,245 @@ def fetch_request(path: str, idx: int):
                     results.append({"h3": h3_text, "table": table_data, "generation": header})
                 else:
                     results.append({"h3": h3_text, "table": None, "generation": header})
-        print(results)
     return results
 
+
+def _text(el):
+    """Como get_text(strip=True) de BeautifulSoup: trozos de texto sin espacios, pegados"""
+    return "".join(t.strip() for t in el.itertext())
+
+
+def _fr_rows(table):
+    """Filas de una data-table que tienen celda FR, sin las columnas de juegos"""
+    rows = []
+    for row in table.iter("tr"):
+        cells = list(row.iter("td", "th"))
+        if not any(c.tag == "td" and FR_CLASS in (c.get("class") or "").split() for c in cells):
+            continue
+        cols = []
+        for col in cells:
+            classes = col.get("class")
+            if classes is not None:
+                if SKIP_CLASSES.isdisjoint(classes.split()):
+                    cols.append({"text": _text(col) or None})
+            else:
+                img = next(col.iter("img"), None)
+                if img is not None:
+                    cols.append({"text": img.get("alt", "") or None})
+        if cols:
+            rows.append(cols)
+    return rows
+
+
+def parse_page_lxml(html):
+    """
+    Mismo resultado que parse_page_bs4 en una sola pasada por el documento:
+    cada <h3> dentro de una sección gen3 queda pendiente hasta la siguiente
+    data-table, que se lee una vez para todos los <h3> que la esperan.
+    """
+    if not html.strip():
+        return None
+    results, pending = [], []
+    header = None       # texto del <h2> gen3 actual; None fuera de gen3
+    found = False
+    for el in lxml.html.fromstring(html).iter():
+        tag = el.tag
+        if tag == "h2":
+            header = _text(el) if (el.get("id") or "").startswith("gen3") else None
+            found = found or header is not None
+        elif tag == "h3" and header is not None:
+            entry = {"h3": _text(el), "table": None, "generation": header}
+            results.append(entry)
+            pending.append(entry)
+        elif tag == "table" and pending and "data-table" in (el.get("class") or "").split():
+            table = _fr_rows(el)
+            for entry in pending:
+                entry["table"] = table
+            pending = []
+    return results if found else None
+
+
+parse_page = parse_page_bs4 if lxml is None else parse_page_lxml
+
+
+def fetch_request(path: str, idx: int, session, bucket, base=BASE, cache=None,
+                  replay=False, reparse=False):
+    """
+    Secciones de la página (ver parse_page), False si no se pudo obtener o
+    UNCHANGED si el servidor respondió 304 y no se pidió `reparse`. Si hay que
+    reparsear un 304 pero la caché no tiene el cuerpo, la página se vuelve a
+    pedir sin GET condicional.
+    """
+    url = urljoin(base, path)
+    if replay:
+        entry = cache.get(url)
+        if entry is None:
+            print(f"[{idx}] ERROR {url} no está en la caché")
+            return False
+        html = entry["body"]
+    else:
+        headers = cache.conditional_headers(url) if cache else None
+        resp = fetch(session, url, bucket, idx, headers)
+        if resp is None:
+            return False
+        if resp.status_code == 304:
+            if not reparse:
+                return UNCHANGED
+            entry = cache.get(url) if cache else None
+            if entry is None:
+                print(f"[{idx}] ⚠ 304 para {url} sin cuerpo en la caché; se pide completa")
+                resp = fetch(session, url, bucket, idx)
+                if resp is None or resp.status_code == 304:
+                    print(f"[{idx}] ERROR no se pudo obtener {url} completa")
+                    return False
+        if resp.status_code == 304:
+            html = entry["body"]
+        else:
+            if cache:
+                cache.put(url, resp)
+            html = resp.text
+
+    results = parse_page(html)
+    if results is None:
+        print(f"[{idx}] No se encontró ningún <h2 id='gen3...'> en {url}")
+    return results
+
+
+def page_rows(data):
+    """
+    Filas del CSV de una página a partir de las secciones de parse_page. Las
+    celdas vacías (None) quedan como '', igual que al leer el CSV escrito, así
+    el sumidero Postgres descarta las mismas filas que load_data.py.
+    """
+    rows = []
+    for section in data:
+        metodo = section['h3']
+        generation = section['generation']
+        if section['table'] is None:
+            continue
+        for row in section['table']:
+            pokemon = row[0]['text'] or ''
+            rareza = row[1]['text'] or ''
+            nivel = row[2]['text'] or ''
+            rows.append({
+                    'Pokémon': pokemon,
+                    'Rareza': rareza,
+                    'Nivel': nivel,
+                    'Método': metodo,
+                    'Generación': generation
+                })
+    return rows
+
+
+def csv_path(out_dir, path):
+    return os.path.join(out_dir, f"{path.rstrip('/').split('/')[-1]}.csv")
+
+
+def write_csv(out_dir, path, rows):
+    with open(csv_path(out_dir, path), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class ZoneLoader:
+    """
+    Sumidero Postgres del scraper: reemplaza los encuentros de cada zona con
+    load_data.replace_zone_encounters y hace commit por página, así la zona
+    queda consultable apenas llega. load_data y psycopg2 se importan recién
+    acá, para que el scraper a CSV no los necesite.
+    """
+
+    def __init__(self, mode='batch'):
+        sys.path.insert(0, ROOT_DIR)
+        import psycopg2
+        import load_data
+        from load_pipeline import ENCOUNTER_COLUMNS, PostgresSink, StageStats, build_pokemon_index
+        self.load_data = load_data
+        self.conn = psycopg2.connect(**load_data.DB_CONFIG)
+        self.cursor = self.conn.cursor()
+        self.pokemon_index = build_pokemon_index(self.cursor)
+        self.sink = PostgresSink(self.cursor, 'encounters', ENCOUNTER_COLUMNS, mode)
+        self.stats = StageStats('encounters')
+        self.unmatched = Counter()
+        self.zones = self.inserted = 0
+
+    def load(self, zone_code, rows):
+        try:
+            _, count = self.load_data.replace_zone_encounters(
+                self.cursor, self.sink, zone_code, rows, self.pokemon_index, self.unmatched, self.stats)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"❌ {zone_code}: no se pudo cargar ({e})")
+            return False
+        self.zones += 1
+        self.inserted += count
+        return True
+
+    def close(self):
+        from load_pipeline import report_unmatched
+        if self.zones:
+            self.stats.report()
+            self.load_data.refresh_zone_ev_rates(self.conn)
+        report_unmatched(self.unmatched)
+        print(f"✓ {self.zones} zonas y {self.inserted} encuentros cargados en la base")
+        self.conn.close()
+
+
 def main():
-    os.makedirs("csv", exist_ok=True)
-    all_results = []
-    for i, t in enumerate(targets, start=1):
-        data = fetch_request(t, i)
-        if data:
-            all_results.append({"url": urljoin(BASE, t), "data": data})
-        time.sleep(DELAY)
-    
-    for result in all_results:
-        rows = []
-        data = result['data']
-        for section in data:
-            metodo = section['h3']
-            generation = section['generation']
-            if section['table'] is None:
-                continue
-            for row in section['table']:
-                pokemon = row[0]['text']
-                rareza = row[1]['text']
-                nivel = row[2]['text']
-                rows.append({
-                        'Pokémon': pokemon,
-                        'Rareza': rareza,
-                        'Nivel': nivel,
-                        'Método': metodo,
-                        'Generación': generation
-                    })
-        csv_filename = os.path.join("csv", f"{result['url'].rstrip('/').split('/')[-1]}.csv")
-        
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['Pokémon', 'Rareza', 'Nivel', 'Método', 'Generación'])
-            writer.writeheader()
-            writer.writerows(rows)
+    ap = argparse.ArgumentParser(description="Baja los encuentros FR de cada zona de Kanto a csv/.")
+    ap.add_argument("--base", default=BASE, help=f"URL base del sitio (default: {BASE}).")
+    ap.add_argument("--out", default="csv", help="Carpeta de salida (default: csv).")
+    ap.add_argument("--workers", type=int, default=WORKERS, help=f"Pedidos en vuelo a la vez (default: {WORKERS}).")
+    ap.add_argument("--rate", type=float, default=RATE,
+                    help=f"Pedidos por segundo al host; 0 = sin límite (default: {RATE}).")
+    ap.add_argument("--cache", default=CACHE_DIR, help=f"Carpeta de la caché HTTP (default: {CACHE_DIR}).")
+    ap.add_argument("--no-cache", action="store_true", help="Baja todo sin GET condicional ni caché.")
+    ap.add_argument("--replay", action="store_true", help="Parsea solo desde la caché, sin red.")
+    ap.add_argument("--sink", choices=("csv", "postgres", "both"), default="csv",
+                    help="csv (default); postgres: encuentros directo a la base por zona; both: ambos.")
+    ap.add_argument("--mode", choices=("batch", "copy"), default="batch",
+                    help="Inserción en la base para --sink postgres/both (como load_data.py --mode).")
+    args = ap.parse_args()
+    if args.replay and args.no_cache:
+        ap.error("--replay necesita la caché")
+
+    to_csv = args.sink in ("csv", "both")
+    if to_csv:
+        os.makedirs(args.out, exist_ok=True)
+    loader = ZoneLoader(args.mode) if args.sink in ("postgres", "both") else None
+    cache = None if args.no_cache else HttpCache(args.cache)
+    session = None if args.replay else make_session(args.workers)
+    bucket = TokenBucket(args.rate)
+    start = time.perf_counter()
+    done = failed = unchanged = 0
+    with ThreadPoolExecutor(args.workers) as pool:
+        # Con 304 la página se reparsea desde la caché si va a la base o si
+        # falta su CSV
+        futures = {pool.submit(fetch_request, t, i, session, bucket, args.base, cache, args.replay,
+                               loader is not None or (to_csv and not os.path.exists(csv_path(args.out, t)))): t
+                   for i, t in enumerate(targets, start=1)}
+        for future in as_completed(futures):
+            data = future.result()
+            path = futures[future]
+            if data is False:
+                failed += 1
+            elif data is UNCHANGED:
+                unchanged += 1
+            elif data:
+                rows = page_rows(data)
+                if to_csv:
+                    write_csv(args.out, path, rows)
+                if loader and not loader.load(path.rstrip('/').split('/')[-1], rows):
+                    failed += 1
+                    continue
+                done += 1
+    if loader:
+        loader.close()
+    elapsed = time.perf_counter() - start
+    print(f"✓ {done} páginas procesadas ({args.sink}), {unchanged} sin cambios, "
+          f"{failed} con error ({elapsed:.1f}s)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,33 +1,50 @@
 #!/usr/bin/env python3
+"""
+Construye la grilla de baldosas (map/matrices/*.csv) y su PNG de validación
+(map/matricesPng/*.png) a partir de las máscaras de colores. Junto al CSV se
+escribe la misma grilla en formato binario .grid (capas passable, encounter y
+exits; ver route_utils.load_grid).
+
+    python GeneradorMatriz.py --mask fotosObstaculos/Route1.png
+    python GeneradorMatriz.py --batch fotosObstaculos --workers 4
+
+En modo --batch se saltan las imágenes cuyo hash y parámetros (--tile,
+umbrales HSV) coinciden con la última corrida (matrices/.cache.json).
+"""
 import argparse
+import hashlib
+import json
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 import cv2
 import numpy as np
-import pandas as pd
+from route_utils import grid_bytes, exit_layer
 
-def load_image(path):
+def read_image(path):
+    """Decodifica la imagen tal cual (BGR o BGRA uint8), sin convertir nada aún"""
     img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
     if img is None:
         raise FileNotFoundError(f"No pude leer la imagen: {path}")
-    # Si trae alfa, compón sobre blanco para colores consistentes
-    if img.shape[2] == 4:
-        b,g,r,a = cv2.split(img)
-        alpha = a.astype(float)/255.0
-        bg = np.ones_like(b, dtype=float)*255.0
-        b = (b*alpha + bg*(1-alpha)).astype(np.uint8)
-        g = (g*alpha + bg*(1-alpha)).astype(np.uint8)
-        r = (r*alpha + bg*(1-alpha)).astype(np.uint8)
-        img = cv2.merge([b,g,r])
     return img
 
-def tile_iter(h, w, tile):
-    nrows = h // tile
-    ncols = w // tile
-    for r in range(nrows):
-        for c in range(ncols):
-            y0, y1 = r*tile, (r+1)*tile
-            x0, x1 = c*tile, (c+1)*tile
-            yield r, c, y0, y1, x0, x1
+def composite_white(img):
+    """
+    BGR uint8 de una imagen o franja. Si trae alfa, compón sobre blanco para
+    colores consistentes: (c*a + 255*(255-a)) // 255 en uint16, que no
+    desborda (máx. 255*255) y evita los arreglos float64 de 8 bytes por canal.
+    """
+    if img.shape[2] != 4:
+        return img
+    a = img[:, :, 3:4].astype(np.uint16)
+    out = img[:, :, :3] * a
+    out += 255 * (255 - a)
+    out //= 255
+    return out.astype(np.uint8)
+
+def load_image(path):
+    return composite_white(read_image(path))
 
 def hsv_mask(img_bgr, hue_ranges, s_min=60, v_min=60):
     """Devuelve máscara bool para un conjunto de rangos de tono (en OpenCV H=0..179)."""
@@ -44,12 +61,225 @@ def hsv_mask(img_bgr, hue_ranges, s_min=60, v_min=60):
     mask &= (S >= s_min) & (V >= v_min)
     return mask
 
-def majority(mask, y0, y1, x0, x1):
-    """True si la mayoría del bloque es True (robusto)."""
-    blk = mask[y0:y1, x0:x1]
-    if blk.size == 0:
-        return False
-    return (blk.mean() > 0.5)
+def block_majority(mask, tile):
+    """
+    Matriz (nrows, ncols) con True donde la mayoría del bloque tile×tile es True.
+    Se recorta a múltiplos de tile y se suma cada bloque de una vez con un
+    reshape a (nrows, tile, ncols, tile); comparar cuentas enteras
+    (2*suma > tile²) evita el redondeo de la media.
+    """
+    nrows, ncols = mask.shape[0] // tile, mask.shape[1] // tile
+    blocks = mask[:nrows*tile, :ncols*tile].reshape(nrows, tile, ncols, tile)
+    counts = blocks.sum(axis=(1, 3), dtype=np.int64)
+    return counts * 2 > tile * tile
+
+# Colores del overlay (BGR) indexados por passable*2 + encounter:
+# transitables en cian, bloqueadas en rojo; encounter mezcla verde al 50 %.
+PASSABLE_COLOR = np.array([255, 200, 0], dtype=np.float32)   # cian-ish
+BLOCKED_COLOR  = np.array([0, 0, 255], dtype=np.float32)     # rojo
+ENCOUNTER_TINT = np.array([0, 255, 0], dtype=np.float32)
+OVERLAY_LUT = np.stack([
+    BLOCKED_COLOR, BLOCKED_COLOR*0.5 + ENCOUNTER_TINT*0.5,
+    PASSABLE_COLOR, PASSABLE_COLOR*0.5 + ENCOUNTER_TINT*0.5,
+]).astype(np.uint8)
+
+def render_overlay(mat, enc_mat, h, w, tile):
+    """
+    PNG de validación de h×w: cada celda se pinta con OVERLAY_LUT, se amplía
+    a tile×tile con np.repeat y la rejilla negra se dibuja por slicing. Lo que
+    sobra a la derecha/abajo de la última baldosa completa queda en blanco.
+    """
+    nrows, ncols = mat.shape
+    overlay = np.full((h, w, 3), 255, dtype=np.uint8)
+    cells = OVERLAY_LUT[mat.astype(np.intp)*2 + enc_mat.astype(np.intp)]
+    overlay[:nrows*tile, :ncols*tile] = cells.repeat(tile, axis=0).repeat(tile, axis=1)
+
+    # Rejilla para referencia (la última línea cae en el borde si la imagen calza justo)
+    overlay[np.minimum(np.arange(nrows+1)*tile, h-1), :] = 0
+    overlay[:, np.minimum(np.arange(ncols+1)*tile, w-1)] = 0
+    return overlay
+
+def open_inputs(mask=None, passable=None, blocked=None, encounter=None):
+    """Decodifica las imágenes de entrada y valida tamaños; devuelve (imágenes, h, w)"""
+    # 1) Cargar imágenes base
+    if mask:
+        images = {"mask": read_image(mask)}
+    else:
+        # Dos imágenes: transitables/obstáculos
+        images = {"passable": read_image(passable), "blocked": read_image(blocked)}
+        if images["passable"].shape[:2] != images["blocked"].shape[:2]:
+            raise ValueError("Las imágenes passable y blocked no tienen el mismo tamaño.")
+    h, w = next(iter(images.values())).shape[:2]
+
+    # Zonas de aparición (encuentro) opcional
+    if encounter:
+        images["encounter"] = read_image(encounter)
+        if images["encounter"].shape[:2] != (h, w):
+            raise ValueError("La imagen de encounter no coincide en tamaño con la base.")
+    return images, h, w
+
+def nonwhite_mask(im):
+    # cualquier cosa que no sea casi blanco la consideramos "marcada"
+    gray = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+    return (gray < 240)
+
+def classify_strips(images, h, w, tile=16, s_min=60, v_min=60, enc_s_min=40, enc_v_min=40,
+                    strip_rows=0):
+    """
+    Genera (mat, enc_mat) por franjas horizontales de `strip_rows` filas de
+    baldosas (0 = toda la imagen de una vez). Composición, HSV y máscaras se
+    calculan solo para la franja, así el pico de memoria no depende del alto.
+    """
+    nrows = h // tile
+    strip_rows = strip_rows or max(nrows, 1)
+    for r0 in range(0, nrows, strip_rows):
+        y0, y1 = r0 * tile, min(r0 + strip_rows, nrows) * tile
+        if "mask" in images:
+            img = composite_white(images["mask"][y0:y1])
+            # Heurísticas HSV:
+            # verde ≈ 40..90, rojo ≈ [0..10] ∪ [170..179]
+            green_mask = hsv_mask(img, hue_ranges=[(40, 90)], s_min=s_min, v_min=v_min)
+            red_mask   = hsv_mask(img, hue_ranges=[(0, 10), (170, 179)], s_min=s_min, v_min=v_min)
+            # Default: si no cae en verde o rojo, lo tratamos como "otro" (no transitable).
+        else:
+            # Derivar máscaras binarias por umbral (no-blanco/negro):
+            green_mask = nonwhite_mask(composite_white(images["passable"][y0:y1]))   # transitable
+            red_mask   = nonwhite_mask(composite_white(images["blocked"][y0:y1]))    # bloqueado
+
+        # 2) Construir matriz por celdas, toda la franja a la vez
+        is_green = block_majority(green_mask, tile)
+        is_red   = block_majority(red_mask, tile)
+        # Resolución de conflictos: rojo gana a verde (bloqueado tiene prioridad)
+        mat = (is_green & ~is_red).astype(int)
+
+        if "encounter" in images:
+            # Detectar “pasto”: por defecto usamos verde otra vez; ajusta si tu máscara es distinta:
+            enc_img = composite_white(images["encounter"][y0:y1])
+            enc_mask = hsv_mask(enc_img, hue_ranges=[(40, 90)], s_min=enc_s_min, v_min=enc_v_min)
+            enc_mat = block_majority(enc_mask, tile).astype(int)
+        else:
+            enc_mat = np.zeros(mat.shape, dtype=int)
+        yield mat, enc_mat
+
+@contextmanager
+def atomic_file(path, mode="wb", **kwargs):
+    """Abre un temporal en el directorio de `path` y lo renombra encima al cerrar sin error"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def atomic_write(path, data):
+    """Escribe `data` (bytes) en un temporal del mismo directorio y lo renombra"""
+    with atomic_file(path) as f:
+        f.write(data)
+
+def process_image(inputs, params, out_csv, out_overlay, out_grid, strip_rows=0):
+    """
+    Clasifica `inputs` (kwargs de open_inputs) por franjas y escribe la matriz
+    CSV (solo 'passable') a medida que salen las filas; luego la grilla .grid
+    y el overlay. Cada archivo se escribe de forma atómica. Devuelve la matriz.
+    """
+    images, h, w = open_inputs(**inputs)
+    mats, enc_mats = [], []
+    with atomic_file(out_csv, "w", encoding="utf-8") as f:
+        for mat, enc_mat in classify_strips(images, h, w, strip_rows=strip_rows, **params):
+            # Matriz de 0/1 por filas
+            f.write("".join(", ".join(str(int(v)) for v in row) + "\n" for row in mat))
+            mats.append(mat)
+            enc_mats.append(enc_mat)
+    del images
+
+    ncols = w // params["tile"]
+    mat = np.vstack(mats) if mats else np.zeros((0, ncols), dtype=int)
+    enc_mat = np.vstack(enc_mats) if enc_mats else np.zeros((0, ncols), dtype=int)
+    atomic_write(out_grid, grid_bytes({"passable": mat, "encounter": enc_mat, "exits": exit_layer(mat)}))
+
+    # 3) Overlay de validación
+    overlay = render_overlay(mat, enc_mat, h, w, params["tile"])
+    ok, png = cv2.imencode(".png", overlay)
+    if not ok:
+        raise ValueError(f"No pude codificar el overlay: {out_overlay}")
+    atomic_write(out_overlay, png.tobytes())
+    return mat
+
+def output_paths(out_dir, base_name):
+    return (os.path.join(out_dir, "matrices", base_name + ".csv"),
+            os.path.join(out_dir, "matricesPng", base_name + ".png"),
+            os.path.join(out_dir, "matrices", base_name + ".grid"))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+CACHE_FILE = ".cache.json"
+CACHE_VERSION = 3   # subir si cambia la forma de clasificar o dibujar
+
+def cache_key(path, params):
+    """Hash del contenido de la imagen más los parámetros que afectan la salida"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(dict(params, version=CACHE_VERSION), sort_keys=True).encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _batch_task(path, out_dir, params, strip_rows=0):
+    """Tarea del pool: procesa una máscara y devuelve su dimensión de grilla"""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    mat = process_image({"mask": path}, params, *output_paths(out_dir, base_name), strip_rows=strip_rows)
+    return mat.shape
+
+def run_batch(src_dir, out_dir, params, workers, force=False, debug=False, strip_rows=0):
+    """
+    Procesa cada imagen de `src_dir` como --mask en un pool de procesos.
+    Solo se recalculan las imágenes cuyo cache_key cambió o cuyas salidas faltan.
+    """
+    for sub in ("matrices", "matricesPng"):
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+    cache_path = os.path.join(out_dir, "matrices", CACHE_FILE)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    pending, skipped = [], 0
+    for filename in sorted(os.listdir(src_dir)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(src_dir, filename)
+        base_name = os.path.splitext(filename)[0]
+        key = cache_key(path, params)
+        fresh = cache.get(base_name) == key and all(map(os.path.exists, output_paths(out_dir, base_name)))
+        if fresh and not force:
+            skipped += 1
+        else:
+            pending.append((base_name, path, key))
+
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(min(workers, len(pending))) as pool:
+            futures = {pool.submit(_batch_task, path, out_dir, params, strip_rows): (base_name, key)
+                       for base_name, path, key in pending}
+            for future in as_completed(futures):
+                base_name, key = futures[future]
+                try:
+                    nrows, ncols = future.result()
+                except Exception as e:
+                    failed += 1
+                    cache.pop(base_name, None)
+                    print(f"❌ {base_name}: {e}")
+                    continue
+                cache[base_name] = key
+                if debug:
+                    print(f"✓ {base_name}: {nrows}x{ncols} celdas")
+
+    atomic_write(cache_path, json.dumps(cache, indent=1, sort_keys=True).encode("utf-8"))
+    print(f"✓ {len(pending) - failed} grillas generadas, {skipped} sin cambios, {failed} con error")
+    return failed == 0
 
 def main():
     ap = argparse.ArgumentParser(description="Construye matriz de baldosas desde máscaras (transitable/obstáculo/encuentro).")
@@ -57,130 +287,51 @@ def main():
     ap.add_argument("--passable", help="PNG con transitables (si usas 2 imágenes).")
     ap.add_argument("--blocked", help="PNG con obstáculos (si usas 2 imágenes).")
     ap.add_argument("--encounter", help="PNG con zonas de aparición (opcional).")
+    ap.add_argument("--batch", help="Directorio de máscaras: procesa cada imagen como --mask.")
+    ap.add_argument("--workers", type=int, default=0, help="Procesos para --batch (default: 0 = núcleos disponibles).")
+    ap.add_argument("--force", action="store_true", help="En --batch, ignora el caché y regenera todo.")
     ap.add_argument("--tile", type=int, default=16, help="Tamaño de baldosa en píxeles (default: 16).")
+    ap.add_argument("--s_min", type=int, default=60, help="Saturación mínima HSV de la máscara (default: 60).")
+    ap.add_argument("--v_min", type=int, default=60, help="Brillo mínimo HSV de la máscara (default: 60).")
+    ap.add_argument("--enc_s_min", type=int, default=40, help="Saturación mínima HSV de --encounter (default: 40).")
+    ap.add_argument("--enc_v_min", type=int, default=40, help="Brillo mínimo HSV de --encounter (default: 40).")
+    ap.add_argument("--strip_rows", type=int, default=32,
+                    help="Filas de baldosas por franja al procesar la imagen (default: 32; 0 = toda de una vez).")
     ap.add_argument("--out_csv", default="grid_labels.csv", help="Salida CSV.")
     ap.add_argument("--out_overlay", default="grid_overlay.png", help="PNG de validación.")
     ap.add_argument("--debug", action="store_true", help="Muestra info adicional.")
     args = ap.parse_args()
 
+    params = {"tile": args.tile, "s_min": args.s_min, "v_min": args.v_min,
+              "enc_s_min": args.enc_s_min, "enc_v_min": args.enc_v_min}
+
+    if args.batch:
+        workers = args.workers or os.cpu_count() or 1
+        run_batch(args.batch, os.getcwd(), params, workers, force=args.force, debug=args.debug,
+                  strip_rows=args.strip_rows)
+        return
+
     if not args.mask and not (args.passable and args.blocked):
-        ap.error("Debes pasar --mask o bien --passable y --blocked.")
+        ap.error("Debes pasar --mask, --passable y --blocked, o --batch.")
 
     # Determinar nombre base según la imagen que se está procesando
     input_path = args.mask if args.mask else args.passable
     base_name = os.path.splitext(os.path.basename(input_path))[0]
 
     # Crear carpetas de salida (relativas al working dir)
-    out_dir_csv = os.path.join(os.getcwd(), "matrices")
-    out_dir_png = os.path.join(os.getcwd(), "matricesPng")
-    os.makedirs(out_dir_csv, exist_ok=True)
-    os.makedirs(out_dir_png, exist_ok=True)
+    os.makedirs(os.path.join(os.getcwd(), "matrices"), exist_ok=True)
+    os.makedirs(os.path.join(os.getcwd(), "matricesPng"), exist_ok=True)
 
     # Forzar nombres de salida a partir de la imagen
-    args.out_csv = os.path.join(out_dir_csv, base_name + ".csv")
-    args.out_overlay = os.path.join(out_dir_png, base_name + ".png")
+    args.out_csv, args.out_overlay, out_grid = output_paths(os.getcwd(), base_name)
 
-    # 1) Cargar imágenes base
-    if args.mask:
-        img = load_image(args.mask)
-        h, w, _ = img.shape
-        # Heurísticas HSV:
-        # verde ≈ 40..90, rojo ≈ [0..10] ∪ [170..179]
-        green_mask = hsv_mask(img, hue_ranges=[(40, 90)], s_min=60, v_min=60)
-        red_mask   = hsv_mask(img, hue_ranges=[(0, 10), (170, 179)], s_min=60, v_min=60)
-        # Default: si no cae en verde o rojo, lo tratamos como "otro" (no transitable).
-        has_encounter_img = False
-        enc_mask_full = None
-    else:
-        # Dos imágenes: transitables/obstáculos
-        img_pass = load_image(args.passable)
-        img_block = load_image(args.blocked)
-        if img_pass.shape != img_block.shape:
-            raise ValueError("Las imágenes passable y blocked no tienen el mismo tamaño.")
-        h, w, _ = img_pass.shape
-        # Derivar máscaras binarias por umbral (no-blanco/negro):
-        def nonwhite_mask(im):
-            # cualquier cosa que no sea casi blanco la consideramos "marcada"
-            gray = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
-            return (gray < 240)
-        green_mask = nonwhite_mask(img_pass)   # transitable
-        red_mask   = nonwhite_mask(img_block)  # bloqueado
-        has_encounter_img = False
-        enc_mask_full = None
-
-    # Zonas de aparición (encuentro) opcional
-    if args.encounter:
-        enc_img = load_image(args.encounter)
-        if enc_img.shape[:2] != (h, w):
-            raise ValueError("La imagen de encounter no coincide en tamaño con la base.")
-        # Detectar “pasto”: por defecto usamos verde otra vez; ajusta si tu máscara es distinta:
-        enc_mask_full = hsv_mask(enc_img, hue_ranges=[(40, 90)], s_min=40, v_min=40)
-        has_encounter_img = True
-
-    tile = args.tile
-    nrows = h // tile
-    ncols = w // tile
-
-    # 2) Construir matriz por celdas
-    rows_out = []
-    for r, c, y0, y1, x0, x1 in tile_iter(h, w, tile):
-        # Si alguna imagen no calza exacto, recortamos a múltiplos de tile
-        y1 = min(y1, h); x1 = min(x1, w)
-        is_green = majority(green_mask, y0, y1, x0, x1)
-        is_red   = majority(red_mask,   y0, y1, x0, x1)
-        # Resolución de conflictos: rojo gana a verde (bloqueado tiene prioridad)
-        passable = 1 if (is_green and not is_red) else 0
-        if has_encounter_img and enc_mask_full is not None:
-            enc = 1 if majority(enc_mask_full, y0, y1, x0, x1) else 0
-        else:
-            enc = 0
-        rows_out.append({
-            "row": r, "col": c,
-            "passable": passable,
-            "encounter": enc
-        })
-
-    df = pd.DataFrame(rows_out)
-
-    # Escribir salida como matriz de 0/1 por filas (solo 'passable')
-    mat = np.zeros((nrows, ncols), dtype=int)
-    for rec in rows_out:
-        mat[rec["row"], rec["col"]] = rec["passable"]
-
-    with open(args.out_csv, "w", encoding="utf-8") as f:
-        for r in range(nrows):
-            line = ", ".join(str(int(v)) for v in mat[r, :])
-            f.write(line + "\n")
-
-    # 3) Overlay de validación
-    # Pintamos celdas transitables en cian, bloqueadas en rojo; encounter agrega verde encima.
-    overlay = np.ones((h, w, 3), dtype=np.uint8)*255
-    for r, c, y0, y1, x0, x1 in tile_iter(h, w, tile):
-        rec = df[(df.row==r) & (df.col==c)].iloc[0]
-        if rec.passable == 1:
-            color = (255, 200, 0)  # BGR cian-ish (para OpenCV: (B,G,R) → (255,200,0))
-        else:
-            color = (0, 0, 255)    # rojo
-        cv2.rectangle(overlay, (x0, y0), (x1-1, y1-1), color, thickness=-1)
-        if rec.encounter == 1:
-            # mezclar verde encima
-            sub = overlay[y0:y1, x0:x1].astype(np.float32)
-            sub = sub*0.5 + np.array([0,255,0], dtype=np.float32)*0.5
-            overlay[y0:y1, x0:x1] = sub.astype(np.uint8)
-
-    # Rejilla para referencia
-    for r in range(nrows+1):
-        y = min(r*tile, h-1)
-        cv2.line(overlay, (0,y), (w-1,y), (0,0,0), 1)
-    for c in range(ncols+1):
-        x = min(c*tile, w-1)
-        cv2.line(overlay, (x,0), (x,h-1), (0,0,0), 1)
-
-    cv2.imwrite(args.out_overlay, overlay)
+    inputs = {"mask": args.mask, "passable": args.passable, "blocked": args.blocked, "encounter": args.encounter}
+    mat = process_image(inputs, params, args.out_csv, args.out_overlay, out_grid, strip_rows=args.strip_rows)
     if args.debug:
         print(f"Guardado CSV: {args.out_csv}")
+        print(f"Guardada grilla: {out_grid}")
         print(f"Guardado overlay: {args.out_overlay}")
-        print(f"Dimensión grilla: {nrows}x{ncols} celdas")
+        print(f"Dimensión grilla: {mat.shape[0]}x{mat.shape[1]} celdas")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de bfs_shortest_path (arreglos planos) contra la versión
+original con sets y dicts (bfs_shortest_path_legacy) sobre cada grilla de
+matrices/. Por grilla corre dos consultas y verifica que ambas devuelvan el
+mismo camino:
+
+- lejana: la ruta más larga de la componente principal (doble barrido: la
+  celda más lejana al ancla y, desde ella, la más lejana a esa);
+- completa: hacia un objetivo inalcanzable, que obliga a recorrer todo.
+
+Después compara celdas expandidas y tiempo de BFS, A* y JPS en la consulta
+"lejana", junto al largo del camino en pasos (que debe ser el mismo en los
+tres), y por último arma la
+matriz de distancias entre portales y celdas al azar de cada grilla: N²
+llamadas a bfs_shortest_path contra distance_matrix (N BFS) y
+distance_matrices en un pool de procesos.
+
+    python bench_bfs.py
+    python bench_bfs.py --repeat 50 --src matrices
+    python bench_bfs.py --points 32 --workers 4
+"""
+import argparse
+import os
+import random
+import time
+import numpy as np
+from route_utils import (load_map_matrix, bfs_shortest_path, bfs_shortest_path_legacy,
+                         bfs_distance_field, astar_shortest_path, jps_shortest_path,
+                         extract_portals, distance_matrix, distance_matrices, clear_distance_cache)
+from zone_graph import main_component, anchor_cell
+
+SEARCHES = (("bfs", bfs_shortest_path), ("astar", astar_shortest_path), ("jps", jps_shortest_path))
+
+def time_call(fn, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def matrix_points(mat, n, seed=0):
+    """Centro de cada portal más celdas transitables al azar, hasta `n` puntos"""
+    points = [((int(p["r0"]) + int(p["r1"])) // 2, (int(p["c0"]) + int(p["c1"])) // 2)
+              for p in extract_portals(mat)][:n]
+    cells = [tuple(int(v) for v in rc) for rc in np.argwhere(mat == 1)]
+    random.Random(seed).shuffle(cells)
+    return points + cells[:n - len(points)]
+
+def farthest_cell(mat, source):
+    """Celda alcanzable más lejana desde `source` (r, c)"""
+    dist = bfs_distance_field(mat, [source])
+    return tuple(int(v) for v in np.unravel_index(np.argmax(dist), dist.shape))
+
+def longest_route(mat):
+    """
+    (origen, destino) de la ruta más larga de la componente principal por
+    doble barrido, o None si no hay dos celdas conectadas. Con la primera
+    celda transitable como origen la consulta podía caer en una isla de
+    pocas baldosas y no medir nada.
+    """
+    anchor = anchor_cell(main_component(mat))
+    if anchor is None:
+        return None
+    a = farthest_cell(mat, anchor)
+    b = farthest_cell(mat, a)
+    return (a, b) if a != b else None
+
+def pairwise_matrix(mat, points):
+    """La forma ingenua: un bfs_shortest_path por par"""
+    out = np.full((len(points), len(points)), -1, dtype=np.int32)
+    for i, a in enumerate(points):
+        for j, b in enumerate(points):
+            path = bfs_shortest_path(mat, [a], {b})
+            if path is not None:
+                out[i, j] = len(path) - 1
+    return out
+
+def grid_names(src):
+    names = {os.path.splitext(f)[0] for f in os.listdir(src) if f.endswith((".csv", ".grid"))}
+    return sorted(names)
+
+def main():
+    ap = argparse.ArgumentParser(description="Compara el BFS de arreglos planos con el original.")
+    ap.add_argument("--src", default="matrices", help="Carpeta de grillas (default: matrices).")
+    ap.add_argument("--repeat", type=int, default=20, help="Repeticiones por consulta; se toma la mejor.")
+    ap.add_argument("--points", type=int, default=16, help="Puntos por grilla para la matriz de distancias.")
+    ap.add_argument("--workers", type=int, default=0, help="Procesos para distance_matrices (default: 0 = núcleos).")
+    args = ap.parse_args()
+
+    totals = {"legacy": 0.0, "array": 0.0}
+    long_routes = []
+    print(f"{'grilla':<40} {'celdas':>6} {'consulta':<9} {'legacy ms':>10} {'array ms':>9} {'x':>6}")
+    for name in grid_names(args.src):
+        mat = np.asarray(load_map_matrix(args.src, name))
+        route = longest_route(mat)
+        if route is None:
+            continue
+        source = [route[0]]
+        queries = {
+            "lejana": {route[1]},
+            "completa": {(-1, -1)},
+        }
+        long_routes.append((name, mat, source, queries["lejana"]))
+        for query, targets in queries.items():
+            t_old, path_old = time_call(bfs_shortest_path_legacy, args.repeat, mat, source, targets)
+            t_new, path_new = time_call(bfs_shortest_path, args.repeat, mat, source, targets)
+            if path_old != path_new:
+                raise AssertionError(f"{name} ({query}): los caminos no coinciden")
+            totals["legacy"] += t_old
+            totals["array"] += t_new
+            print(f"{name:<40} {mat.size:>6} {query:<9} {t_old*1e3:>10.3f} {t_new*1e3:>9.3f} "
+                  f"{t_old / t_new:>5.1f}x")
+
+    print(f"\n✓ Mismos caminos en todas las grillas. Total: legacy {totals['legacy']*1e3:.1f} ms, "
+          f"array {totals['array']*1e3:.1f} ms ({totals['legacy'] / totals['array']:.1f}x)")
+
+    print(f"\n{'grilla':<40} {'pasos':>5} " + " ".join(f"{n + ' exp':>9} {n + ' ms':>9}" for n, _ in SEARCHES))
+    for name, mat, source, targets in long_routes:
+        cols, length = [], None
+        for search_name, search in SEARCHES:
+            stats = {}
+            search(mat, source, targets, stats=stats)
+            t, path = time_call(search, args.repeat, mat, source, targets)
+            steps = len(path) - 1 if path else -1
+            if length is None:
+                length = steps
+            elif steps != length:
+                raise AssertionError(f"{name}: {search_name} no encontró un camino mínimo")
+            cols.append(f"{stats['expanded']:>9} {t*1e3:>9.3f}")
+        print(f"{name:<40} {length:>5} " + " ".join(cols))
+
+    grids = {name: (mat, matrix_points(mat, args.points)) for name, mat, _, _ in long_routes}
+    t_pairs = t_rows = 0.0
+    for name, (mat, points) in grids.items():
+        start = time.perf_counter()
+        expected = pairwise_matrix(mat, points)
+        t_pairs += time.perf_counter() - start
+        clear_distance_cache()
+        start = time.perf_counter()
+        got = distance_matrix(mat, points)
+        t_rows += time.perf_counter() - start
+        if not np.array_equal(got, expected):
+            raise AssertionError(f"{name}: distance_matrix no coincide con los pares")
+    clear_distance_cache()
+    start = time.perf_counter()
+    pooled = distance_matrices(grids, workers=args.workers)
+    t_pool = time.perf_counter() - start
+    start = time.perf_counter()
+    distance_matrices(grids, workers=args.workers)
+    t_cached = time.perf_counter() - start
+    for name, (mat, points) in grids.items():
+        if not np.array_equal(pooled[name], distance_matrix(mat, points)):
+            raise AssertionError(f"{name}: distance_matrices no coincide")
+    print(f"\n✓ Matrices de {args.points} puntos en {len(grids)} grillas: pares {t_pairs*1e3:.1f} ms, "
+          f"distance_matrix {t_rows*1e3:.1f} ms, pool {t_pool*1e3:.1f} ms, caché {t_cached*1e3:.2f} ms")
+
+if __name__ == "__main__":
+    main()
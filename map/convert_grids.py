@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Convierte las grillas de texto (matrices/*.csv) al formato binario .grid de
+route_utils, con las capas passable, encounter y exits.
+
+    python convert_grids.py                 # matrices/*.csv -> matrices/*.grid
+    python convert_grids.py --src otra/carpeta --force
+
+Los CSV solo guardan la capa transitable: la de encuentros queda en cero
+hasta regenerar la grilla con GeneradorMatriz.py --encounter.
+"""
+import argparse
+import os
+import numpy as np
+from route_utils import load_csv_matrix, save_grid, load_grid, exit_layer
+
+def convert(csv_path, grid_path):
+    mat = load_csv_matrix(csv_path)
+    if mat.ndim != 2:
+        mat = mat.reshape(0, 0)
+    save_grid(grid_path, {
+        "passable": mat,
+        "encounter": np.zeros(mat.shape, dtype=np.uint8),
+        "exits": exit_layer(mat),
+    })
+    # Verificación: la capa transitable debe leerse igual que el CSV
+    if not np.array_equal(load_grid(grid_path)["passable"], mat):
+        raise ValueError(f"La grilla convertida no coincide con {csv_path}")
+    return mat.shape
+
+def main():
+    ap = argparse.ArgumentParser(description="Convierte matrices CSV al formato binario .grid.")
+    ap.add_argument("--src", default="matrices", help="Carpeta con los CSV (default: matrices).")
+    ap.add_argument("--force", action="store_true", help="Reconvierte aunque el .grid sea más nuevo que el CSV.")
+    args = ap.parse_args()
+
+    converted = skipped = 0
+    for filename in sorted(os.listdir(args.src)):
+        if not filename.endswith(".csv"):
+            continue
+        csv_path = os.path.join(args.src, filename)
+        grid_path = csv_path[:-len(".csv")] + ".grid"
+        if (not args.force and os.path.exists(grid_path)
+                and os.path.getmtime(grid_path) >= os.path.getmtime(csv_path)):
+            skipped += 1
+            continue
+        rows, cols = convert(csv_path, grid_path)
+        converted += 1
+        print(f"✓ {filename} -> {os.path.basename(grid_path)} ({rows}x{cols})")
+    print(f"✓ {converted} grillas convertidas, {skipped} al día")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Campos de distancia precalculados por grupo de salida.
+
+Cada grupo es un portal de extract_portals: un tramo contiguo de salidas
+sobre un borde o una puerta marcada en la grilla con un valor >= 2. Por
+grupo se corre un BFS multi-source y se guarda la matriz de pasos en
+matrices/<mapa>.fields.npz junto al hash de la grilla; si la grilla cambia,
+el campo se recalcula. La distancia de cualquier celda a cualquier salida es
+una lectura del arreglo y el camino sale bajando por el gradiente.
+
+    python distance_fields.py            # precalcula todas las grillas de matrices/
+    python distance_fields.py --force
+"""
+import argparse
+import hashlib
+import os
+import numpy as np
+from route_utils import (load_map_matrix, extract_portals, portal_name, all_portal_cells,
+                         bfs_distance_field)
+
+FIELDS_VERSION = 3
+
+def grid_hash(mat):
+    """Hash del contenido de la grilla (forma y valores); invalida los campos guardados"""
+    mat = np.ascontiguousarray(mat, dtype=np.uint8)
+    digest = hashlib.sha256(f"{FIELDS_VERSION}:{mat.shape}".encode())
+    digest.update(mat.tobytes())
+    return digest.hexdigest()
+
+def exit_groups(mat, passable_value=1):
+    """
+    [(nombre, celdas)] con un grupo por portal de extract_portals: tramos de
+    salida de cada borde ('top:0', 'left:1', ...) y puertas ('door:0', ...).
+    """
+    portals = extract_portals(mat, passable_value=passable_value)
+    return [(portal_name(p), cells) for p, cells in zip(portals, all_portal_cells(mat, portals))]
+
+def walkable_mask(mat, passable_value=1):
+    """Grilla 0/1 de celdas pisables: las transitables y las puertas marcadas (>= 2)"""
+    return ((mat == passable_value) | (mat >= 2)).astype(np.uint8)
+
+def compute_fields(mat, passable_value=1):
+    """(nombres, campos int32 de forma (grupos, filas, columnas)); -1 = inalcanzable"""
+    walkable = walkable_mask(mat, passable_value)
+    groups = exit_groups(mat, passable_value)
+    fields = np.empty((len(groups),) + mat.shape, dtype=np.int32)
+    for g, (_, cells) in enumerate(groups):
+        fields[g] = bfs_distance_field(walkable, cells, passable_value=1)
+    return [name for name, _ in groups], fields
+
+class DistanceFields:
+    """Campos de distancia de un mapa: distancia y camino a cada grupo de salida"""
+
+    def __init__(self, names, fields, digest):
+        self.names = list(names)
+        self.fields = fields
+        self.hash = digest
+        self._index = {name: g for g, name in enumerate(self.names)}
+
+    def distance(self, group, cell):
+        """Pasos desde `cell` hasta el grupo (-1 si no hay camino)"""
+        return int(self.fields[self._index[group]][cell])
+
+    def distances(self, cell):
+        """{grupo: pasos} desde `cell` a todos los grupos alcanzables"""
+        r, c = cell
+        return {name: int(d) for name, d in zip(self.names, self.fields[:, r, c]) if d >= 0}
+
+    def nearest(self, cell):
+        """(grupo, pasos) del grupo más cercano a `cell`, o None"""
+        reachable = self.distances(cell)
+        if not reachable:
+            return None
+        return min(reachable.items(), key=lambda kv: kv[1])
+
+    def path(self, group, cell):
+        """Camino de `cell` hasta el grupo (inclusive), ver descend()"""
+        return descend(self.fields[self._index[group]], cell)
+
+def descend(field, cell):
+    """
+    Camino de `cell` hasta una celda con distancia 0 bajando por `field`: en
+    cada paso se va al primer vecino (arriba, abajo, izquierda, derecha) con
+    un paso menos. None si `cell` no alcanza el grupo.
+    """
+    R, C = field.shape
+    r, c = cell
+    d = int(field[r, c])
+    if d < 0:
+        return None
+    path = [(r, c)]
+    while d > 0:
+        for nr, nc in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
+            if 0 <= nr < R and 0 <= nc < C and field[nr, nc] == d - 1:
+                r, c, d = nr, nc, d - 1
+                break
+        path.append((r, c))
+    return path
+
+def fields_path(matrices_dir, name):
+    return os.path.join(matrices_dir, name + ".fields.npz")
+
+def save_fields(path, fields):
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, hash=np.array(fields.hash), names=np.array(fields.names),
+                        fields=fields.fields)
+    os.replace(tmp, path)
+
+def load_fields(matrices_dir, name, mat=None, passable_value=1, force=False):
+    """
+    Campos del mapa `name`, leídos de su .fields.npz si el hash coincide con
+    la grilla actual; si no, se recalculan y se guardan. None si no hay grilla.
+    """
+    if mat is None:
+        mat = load_map_matrix(matrices_dir, name)
+        if mat is None:
+            return None
+    mat = np.asarray(mat)
+    digest = grid_hash(mat)
+    path = fields_path(matrices_dir, name)
+    if not force and os.path.exists(path):
+        with np.load(path) as data:
+            if str(data["hash"]) == digest:
+                return DistanceFields(data["names"].tolist(), data["fields"], digest)
+    names, fields = compute_fields(mat, passable_value)
+    result = DistanceFields(names, fields, digest)
+    save_fields(path, result)
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description="Precalcula campos de distancia por grupo de salida.")
+    ap.add_argument("--src", default="matrices", help="Carpeta de grillas (default: matrices).")
+    ap.add_argument("--force", action="store_true", help="Recalcula aunque el hash coincida.")
+    args = ap.parse_args()
+
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(args.src) if f.endswith((".csv", ".grid"))})
+    for name in names:
+        fields = load_fields(args.src, name, force=args.force)
+        print(f"✓ {name}: {len(fields.names)} grupos de salida")
+    print(f"✓ {len(names)} grillas con campos de distancia en {args.src}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,26 @@
 import csv
+import hashlib
+import heapq
+import math
+import os
+import struct
+from array import array
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 
+# Formato binario .grid: cabecera de 16 bytes (magic, versión, nº de capas,
+# filas, columnas; little-endian), 16 bytes de nombre ASCII por capa y luego
+# las capas uint8 de filas×columnas una tras otra. Con 3 capas los datos
+# empiezan en el byte 64, así que se pueden mapear sin copiar.
+GRID_MAGIC = b"PGRD"
+GRID_VERSION = 1
+GRID_HEADER = struct.Struct("<4sHHII")
+GRID_LAYERS = ("passable", "encounter", "exits")
+
+# Valores de la capa exits: borde por el que se sale del mapa
+EXIT_LABELS = {"top": 1, "bottom": 2, "left": 3, "right": 4}
+
 def load_csv_matrix(path):
     with open(path, newline='', encoding='utf-8') as f:
         reader = csv.reader(f)
@@ -13,41 +32,614 @@ def save_csv_matrix(mat, path, sep=", "):
         for r in range(mat.shape[0]):
             f.write(sep.join(str(int(v)) for v in mat[r,:]) + "\n")
 
-def detect_edge_exits(mat, edge="top", passable_value=1):
-    exits = []
-    if edge == "top":
-        r = 0
-        for c in range(mat.shape[1]):
-            if mat[r, c] == passable_value:
-                exits.append((r, c))
-    elif edge == "bottom":
-        r = mat.shape[0]-1
-        for c in range(mat.shape[1]):
-            if mat[r, c] == passable_value:
-                exits.append((r, c))
-    elif edge == "left":
-        c = 0
-        for r in range(mat.shape[0]):
-            if mat[r, c] == passable_value:
-                exits.append((r, c))
-    elif edge == "right":
-        c = mat.shape[1]-1
-        for r in range(mat.shape[0]):
-            if mat[r, c] == passable_value:
-                exits.append((r, c))
+def grid_bytes(layers):
+    """
+    Serializa {nombre: matriz} al formato .grid. Las capas se escriben en el
+    orden de GRID_LAYERS (las que falten van en cero) y después las extra.
+    """
+    shapes = {np.shape(m) for m in layers.values()}
+    if len(shapes) != 1:
+        raise ValueError(f"Las capas no tienen el mismo tamaño: {sorted(shapes)}")
+    rows, cols = shapes.pop()
+    names = list(GRID_LAYERS) + [n for n in layers if n not in GRID_LAYERS]
+    header = GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, len(names), rows, cols)
+    header += b"".join(n.encode("ascii").ljust(16, b"\0")[:16] for n in names)
+    data = [np.ascontiguousarray(layers.get(n, np.zeros((rows, cols))), dtype=np.uint8).tobytes()
+            for n in names]
+    return header + b"".join(data)
+
+def save_grid(path, layers):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(grid_bytes(layers))
+    os.replace(tmp, path)
+
+def load_grid(path):
+    """
+    {nombre: matriz uint8} de un .grid, como vistas de solo lectura de un
+    único np.memmap: no se parsea nada y varios procesos comparten páginas.
+    """
+    with open(path, "rb") as f:
+        head = f.read(GRID_HEADER.size)
+        if len(head) < GRID_HEADER.size:
+            raise ValueError(f"Grilla truncada: {path}")
+        magic, version, nlayers, rows, cols = GRID_HEADER.unpack(head)
+        if magic != GRID_MAGIC or version != GRID_VERSION:
+            raise ValueError(f"No es una grilla .grid v{GRID_VERSION}: {path}")
+        names = [f.read(16).rstrip(b"\0").decode("ascii") for _ in range(nlayers)]
+    offset = GRID_HEADER.size + 16 * nlayers
+    if os.path.getsize(path) < offset + nlayers * rows * cols:
+        raise ValueError(f"Grilla truncada: {path}")
+    if rows * cols == 0:
+        return {n: np.zeros((rows, cols), dtype=np.uint8) for n in names}
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(nlayers, rows, cols))
+    return dict(zip(names, data))
+
+def load_map_matrix(matrices_dir, name):
+    """
+    Capa transitable del mapa `name`: el .grid si existe y no es más viejo que
+    el .csv, si no el .csv; None si no hay ninguno. Un CSV editado a mano no
+    queda tapado por un .grid desactualizado (convert_grids.py lo regenera).
+    """
+    grid_path = os.path.join(matrices_dir, name + ".grid")
+    csv_path = os.path.join(matrices_dir, name + ".csv")
+    if os.path.exists(grid_path):
+        if not os.path.exists(csv_path) or os.path.getmtime(csv_path) <= os.path.getmtime(grid_path):
+            return load_grid(grid_path)["passable"]
+        print(f"⚠ {csv_path} es más nuevo que {grid_path}: se usa el CSV (python convert_grids.py regenera el .grid)")
+    if os.path.exists(csv_path):
+        return load_csv_matrix(csv_path)
+    return None
+
+def exit_layer(mat, passable_value=1):
+    """Capa exits: EXIT_LABELS en las celdas transitables de cada borde, 0 en el resto"""
+    exits = np.zeros(mat.shape, dtype=np.uint8)
+    if mat.size:
+        for edge, label in EXIT_LABELS.items():
+            relabel_coords(exits, detect_edge_exits(mat, edge, passable_value), label)
     return exits
 
+def _edge_line(mat, edge):
+    """Fila o columna del borde `edge` ('top', 'bottom', 'left', 'right')"""
+    if edge == "top":
+        return mat[0, :]
+    if edge == "bottom":
+        return mat[-1, :]
+    if edge == "left":
+        return mat[:, 0]
+    if edge == "right":
+        return mat[:, -1]
+    return mat[:0, 0]
+
+def _edge_cell(mat, edge, i):
+    """Celda (r, c) del índice `i` a lo largo del borde `edge`"""
+    if edge == "top":
+        return 0, i
+    if edge == "bottom":
+        return mat.shape[0] - 1, i
+    if edge == "left":
+        return i, 0
+    return i, mat.shape[1] - 1
+
+def detect_edge_exits(mat, edge="top", passable_value=1):
+    """Celdas transitables del borde `edge`, en orden a lo largo del borde"""
+    mat = np.asarray(mat)
+    if mat.ndim != 2 or mat.size == 0:
+        return []
+    idx = np.flatnonzero(_edge_line(mat, edge) == passable_value).tolist()
+    return [_edge_cell(mat, edge, i) for i in idx]
+
 def relabel_coords(mat, coords, new_value):
-    for (r,c) in coords:
-        mat[r,c] = new_value
+    if coords:
+        rows, cols = zip(*coords)
+        mat[list(rows), list(cols)] = new_value
     return mat
 
-def bfs_shortest_path(mat, sources, targets, passable_value=1):
+# Tabla de portales de extract_portals: una fila por tramo de salida de un
+# borde o puerta marcada. `segment` numera los tramos de cada lado, `label` es
+# el valor de la puerta (0 en los bordes) y r0..c1 es el rectángulo que los
+# contiene (en los bordes, el tramo mismo).
+PORTAL_SIDES = ("top", "bottom", "left", "right", "door")
+PORTAL_DTYPE = np.dtype([("map", "U40"), ("side", "U6"), ("segment", "i4"), ("label", "u1"),
+                         ("r0", "i4"), ("c0", "i4"), ("r1", "i4"), ("c1", "i4"), ("size", "i4")])
+
+def _door_components(mat):
+    """
+    (filas, columnas, componente) de las celdas con puerta (>= 2), agrupadas
+    por componente 4-conexa del mismo valor: cada celda arranca con su índice
+    plano y toma el mínimo de sus vecinas iguales hasta que nada cambia.
+    """
+    mask = mat >= 2
+    if not mask.any():
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, empty
+    rows, cols = np.nonzero(mask)
+    sentinel = mat.size
+    ids = np.where(mask, np.arange(mat.size).reshape(mat.shape), sentinel)
+    same_v = mask[1:, :] & (mat[1:, :] == mat[:-1, :])
+    same_h = mask[:, 1:] & (mat[:, 1:] == mat[:, :-1])
+    while True:
+        new = ids.copy()
+        np.minimum(new[1:, :], np.where(same_v, ids[:-1, :], sentinel), out=new[1:, :])
+        np.minimum(new[:-1, :], np.where(same_v, ids[1:, :], sentinel), out=new[:-1, :])
+        np.minimum(new[:, 1:], np.where(same_h, ids[:, :-1], sentinel), out=new[:, 1:])
+        np.minimum(new[:, :-1], np.where(same_h, ids[:, 1:], sentinel), out=new[:, :-1])
+        if np.array_equal(new, ids):
+            break
+        ids = new
+    _, comp = np.unique(ids[rows, cols], return_inverse=True)
+    return rows, cols, comp.ravel()
+
+def extract_portals(mat, name="", passable_value=1):
+    """
+    Tabla de portales del mapa `name` (arreglo estructurado PORTAL_DTYPE):
+    los tramos contiguos de celdas transitables de los cuatro bordes, en el
+    orden de PORTAL_SIDES, y después las puertas marcadas con valores >= 2
+    agrupadas en componentes conexas.
+    """
+    mat = np.asarray(mat)
+    if mat.ndim != 2 or mat.size == 0:
+        return np.zeros(0, dtype=PORTAL_DTYPE)
+    R, C = mat.shape
+    # Los cuatro bordes en un solo arreglo, separados por un 0: un diff marca
+    # dónde empieza y termina cada tramo.
+    lengths = np.array([C, C, R, R])
+    offsets = np.cumsum(lengths + 1) - lengths
+    line = np.zeros(int(offsets[-1] + R + 1), dtype=np.int8)
+    for k, edge in enumerate(PORTAL_SIDES[:4]):
+        line[offsets[k]:offsets[k] + lengths[k]] = _edge_line(mat, edge) == passable_value
+    step = np.diff(line)
+    starts, ends = np.flatnonzero(step == 1) + 1, np.flatnonzero(step == -1)
+    edge = np.searchsorted(offsets, starts, side="right") - 1
+    start, end = starts - offsets[edge], ends - offsets[edge]
+    fixed = np.array([0, R - 1, 0, C - 1])[edge]
+    across = edge < 2
+
+    rows, cols, comp = _door_components(mat)
+    n_doors = int(comp.max()) + 1 if comp.size else 0
+    table = np.zeros(edge.size + n_doors, dtype=PORTAL_DTYPE)
+    table["map"] = name
+    edges, doors = table[:edge.size], table[edge.size:]
+    edges["side"] = np.array(PORTAL_SIDES)[edge]
+    edges["segment"] = np.arange(edge.size) - np.searchsorted(edge, edge)
+    edges["r0"], edges["r1"] = np.where(across, fixed, start), np.where(across, fixed, end)
+    edges["c0"], edges["c1"] = np.where(across, start, fixed), np.where(across, end, fixed)
+    edges["size"] = end - start + 1
+    if n_doors:
+        doors["side"] = "door"
+        doors["segment"] = np.arange(n_doors)
+        doors["r0"] = doors["c0"] = np.iinfo(np.int32).max
+        np.minimum.at(doors["r0"], comp, rows)
+        np.minimum.at(doors["c0"], comp, cols)
+        np.maximum.at(doors["r1"], comp, rows)
+        np.maximum.at(doors["c1"], comp, cols)
+        first = np.unique(comp, return_index=True)[1]
+        doors["label"] = mat[rows[first], cols[first]]
+        doors["size"] = np.bincount(comp, minlength=n_doors)
+    return table
+
+def portal_name(portal):
+    """'top:0', 'door:1', ...: lado y número de tramo de una fila de la tabla"""
+    return f"{portal['side']}:{int(portal['segment'])}"
+
+def portal_cells(mat, portal, doors=None):
+    """
+    Celdas [(r, c)] de una fila de la tabla de extract_portals. Las de una
+    puerta son las de su componente (no todo el rectángulo: otra puerta con
+    el mismo valor puede caer dentro); `doors` es la salida de
+    _door_components(mat), para no recalcularla en cada puerta.
+    """
+    r0, c0, r1, c1 = (int(portal[k]) for k in ("r0", "c0", "r1", "c1"))
+    if portal["side"] == "door":
+        rows, cols, comp = _door_components(np.asarray(mat)) if doors is None else doors
+        member = comp == int(portal["segment"])
+        return [(int(r), int(c)) for r, c in zip(rows[member], cols[member])]
+    return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+def all_portal_cells(mat, portals):
+    """[celdas de cada portal] en el orden de la tabla, con las puertas agrupadas una sola vez"""
+    mat = np.asarray(mat)
+    doors = _door_components(mat) if (portals["side"] == "door").any() else None
+    return [portal_cells(mat, p, doors) for p in portals]
+
+def padded_grid(mat, passable_value=1, targets=()):
+    """
+    Aplana `mat` con un borde de una celda alrededor: la celda (r, c) pasa a
+    ser el índice (r+1)*W + (c+1) con W = columnas + 2, y los vecinos son
+    índice ± 1 y ± W sin chequear límites (el borde nunca es transitable).
+    Devuelve (W, abiertas, objetivos) como bytes 0/1; las celdas objetivo
+    cuentan como abiertas aunque no sean transitables.
+    """
+    R, C = mat.shape
+    W = C + 2
+    open_ = np.zeros((R + 2, W), dtype=np.uint8)
+    open_[1:-1, 1:-1] = mat == passable_value
+    goal = np.zeros((R + 2, W), dtype=np.uint8)
+    for r, c in targets:
+        if 0 <= r < R and 0 <= c < C:
+            goal[r + 1, c + 1] = 1
+    open_ |= goal
+    return W, open_.tobytes(), goal.tobytes()
+
+def _cell(i, W):
+    return (i // W - 1, i % W - 1)
+
+def _source_indices(mat, sources, W, open_):
+    """Índices planos de los sources abiertos y dentro de la grilla, sin repetir y en orden"""
+    R, C = mat.shape
+    seen = set()
+    for r, c in sources:
+        if 0 <= r < R and 0 <= c < C:
+            i = (r + 1) * W + c + 1
+            if open_[i] and i not in seen:
+                seen.add(i)
+                yield i
+
+def _trace(prev, hit, W):
+    """Camino de celdas (r,c) desde el source hasta `hit` siguiendo `prev`"""
+    path = []
+    while hit >= 0:
+        path.append(_cell(hit, W))
+        hit = prev[hit]
+    return list(reversed(path))
+
+def bfs_search(mat, sources, targets=(), passable_value=1, stats=None):
+    """
+    BFS sobre índices planos de la grilla con borde (ver padded_grid), con
+    `dist` y `prev` preasignados como arreglos int32. Se detiene al sacar de
+    la cola la primera celda de `targets`; sin targets recorre todo lo
+    alcanzable. Devuelve (W, dist, prev, índice del objetivo o -1). Si se
+    pasa `stats` (dict), suma en stats['expanded'] las celdas sacadas de la cola.
+    """
+    W, open_, goal = padded_grid(mat, passable_value, targets)
+    n = len(open_)
+    dist = array("i", [-1]) * n
+    prev = array("i", [-1]) * n
+    offsets = (-W, W, -1, 1)   # arriba, abajo, izquierda, derecha
+
+    q = deque()
+    for i in _source_indices(mat, sources, W, open_):
+        dist[i] = 0
+        q.append(i)
+    expanded = 0
+    hit = -1
+    while q:
+        u = q.popleft()
+        expanded += 1
+        if goal[u]:
+            hit = u
+            break
+        du = dist[u] + 1
+        for o in offsets:
+            v = u + o
+            if open_[v] and dist[v] < 0:
+                dist[v] = du
+                prev[v] = u
+                q.append(v)
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    return W, dist, prev, hit
+
+def bfs_shortest_path(mat, sources, targets, passable_value=1, stats=None):
     """
     sources: iterable de (r,c)
     targets: set de (r,c)
     Devuelve lista de celdas desde un source hasta target (inclusive) o None.
     """
+    W, _, prev, hit = bfs_search(mat, sources, targets, passable_value, stats)
+    if hit < 0:
+        return None
+    # reconstruir camino
+    return _trace(prev, hit, W)
+
+def _manhattan_to(targets, W):
+    """h(i): distancia Manhattan mínima de la celda plana i a algún target"""
+    goals = [divmod(t, W) for t in targets]
+    if len(goals) == 1:
+        (tr, tc), = goals
+        def h(i):
+            r, c = divmod(i, W)
+            return abs(r - tr) + abs(c - tc)
+    else:
+        def h(i):
+            r, c = divmod(i, W)
+            return min(abs(r - tr) + abs(c - tc) for tr, tc in goals)
+    return h
+
+def astar_shortest_path(mat, sources, targets, passable_value=1, stats=None):
+    """
+    A* con heurística Manhattan (mínima sobre los targets) y el mismo
+    contrato que bfs_shortest_path: el camino tiene el mismo largo que el
+    del BFS, aunque ante empates puede elegir otras celdas. stats['expanded']
+    cuenta las celdas cerradas.
+    """
+    W, open_, goal = padded_grid(mat, passable_value, targets)
+    goal_cells = list(_source_indices(mat, targets, W, goal))
+    if not goal_cells:
+        return None
+    h = _manhattan_to(goal_cells, W)
+    n = len(open_)
+    g = array("i", [-1]) * n
+    prev = array("i", [-1]) * n
+    closed = bytearray(n)
+    offsets = (-W, W, -1, 1)
+
+    heap = []
+    for i in _source_indices(mat, sources, W, open_):
+        g[i] = 0
+        hi = h(i)
+        heap.append((hi, hi, i))
+    heapq.heapify(heap)
+    expanded = 0
+    hit = -1
+    while heap:
+        _, _, u = heapq.heappop(heap)
+        if closed[u]:
+            continue
+        closed[u] = 1
+        expanded += 1
+        if goal[u]:
+            hit = u
+            break
+        gv = g[u] + 1
+        for o in offsets:
+            v = u + o
+            if open_[v] and not closed[v] and (g[v] < 0 or gv < g[v]):
+                g[v] = gv
+                prev[v] = u
+                hv = h(v)
+                heapq.heappush(heap, (gv + hv, hv, v))
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    return None if hit < 0 else _trace(prev, hit, W)
+
+def jps_shortest_path(mat, sources, targets, passable_value=1, stats=None):
+    """
+    Jump Point Search para grillas 4-conexas de costo uniforme (la variante
+    "never diagonal" de pathfinding.js). Avanza en línea recta hasta un
+    target, un vecino forzado o, en los saltos verticales, una celda desde la
+    que se abre un salto horizontal útil; solo esos puntos entran al heap.
+    Mismo contrato y largo de camino que bfs_shortest_path. stats suma
+    'expanded' (puntos de salto cerrados) y 'scanned' (celdas recorridas).
+    """
+    W, open_, goal = padded_grid(mat, passable_value, targets)
+    goal_cells = list(_source_indices(mat, targets, W, goal))
+    if not goal_cells:
+        return None
+    h = _manhattan_to(goal_cells, W)
+    n = len(open_)
+    g = array("i", [-1]) * n
+    prev = array("i", [-1]) * n
+    closed = bytearray(n)
+    scanned = 0
+
+    def jump_h(x, d):
+        """Salto horizontal (d = ±1): primer punto de salto o -1"""
+        nonlocal scanned
+        while open_[x]:
+            scanned += 1
+            if goal[x]:
+                return x
+            if (open_[x - W] and not open_[x - d - W]) or (open_[x + W] and not open_[x - d + W]):
+                return x
+            x += d
+        return -1
+
+    def jump(x, d):
+        """Salto en dirección d (±1 o ±W) desde la celda x ya desplazada"""
+        nonlocal scanned
+        if d in (1, -1):
+            return jump_h(x, d)
+        while open_[x]:
+            scanned += 1
+            if goal[x]:
+                return x
+            if (open_[x - 1] and not open_[x - d - 1]) or (open_[x + 1] and not open_[x - d + 1]):
+                return x
+            # Al avanzar en vertical hay que mirar si se abre un salto horizontal
+            if jump_h(x + 1, 1) >= 0 or jump_h(x - 1, -1) >= 0:
+                return x
+            x += d
+        return -1
+
+    heap = []
+    for i in _source_indices(mat, sources, W, open_):
+        g[i] = 0
+        hi = h(i)
+        heap.append((hi, hi, i))
+    heapq.heapify(heap)
+    expanded = 0
+    hit = -1
+    while heap:
+        _, _, u = heapq.heappop(heap)
+        if closed[u]:
+            continue
+        closed[u] = 1
+        expanded += 1
+        if goal[u]:
+            hit = u
+            break
+        # Vecinos podados: sin padre, los 4; si no, seguir de frente y los costados
+        p = prev[u]
+        if p < 0:
+            directions = (-W, W, -1, 1)
+        else:
+            step = u - p
+            d = (1 if step > 0 else -1) if abs(step) < W else (W if step > 0 else -W)
+            directions = (d, W, -W) if d in (1, -1) else (d, 1, -1)
+        for d in directions:
+            if not open_[u + d]:
+                continue
+            jp = jump(u + d, d)
+            if jp < 0 or closed[jp]:
+                continue
+            gj = g[u] + (abs(jp - u) if d in (1, -1) else abs(jp - u) // W)
+            if g[jp] < 0 or gj < g[jp]:
+                g[jp] = gj
+                prev[jp] = u
+                hj = h(jp)
+                heapq.heappush(heap, (gj + hj, hj, jp))
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+        stats["scanned"] = stats.get("scanned", 0) + scanned
+    if hit < 0:
+        return None
+    # Los puntos de salto quedan en línea recta: se completan las celdas intermedias
+    jumps = []
+    while hit >= 0:
+        jumps.append(hit)
+        hit = prev[hit]
+    jumps.reverse()
+    path = [_cell(jumps[0], W)]
+    for a, b in zip(jumps, jumps[1:]):
+        d = (1 if b > a else -1) if abs(b - a) < W else (W if b > a else -W)
+        for x in range(a + d, b + d, d):
+            path.append(_cell(x, W))
+    return path
+
+def bfs_distance_field(mat, sources, passable_value=1):
+    """Matriz int32 con los pasos desde el source más cercano (-1 si no se alcanza)"""
+    R, C = mat.shape
+    W, dist, _, _ = bfs_search(mat, sources, (), passable_value)
+    return np.frombuffer(dist, dtype=np.int32).reshape(R + 2, W)[1:-1, 1:-1].copy()
+
+# Matrices de distancias: se guardan en memoria (y en disco si se pasa
+# cache_dir) por hash de la grilla transitable y del conjunto de puntos.
+DISTANCE_CACHE_VERSION = 1
+_DISTANCE_CACHE = {}
+
+def distance_key(mat, points, passable_value=1):
+    """Hash de las celdas transitables de `mat` más la lista de puntos"""
+    passable = np.ascontiguousarray(np.asarray(mat) == passable_value)
+    digest = hashlib.sha256(f"{DISTANCE_CACHE_VERSION}:{passable.shape}".encode())
+    digest.update(np.packbits(passable).tobytes())
+    digest.update(np.asarray(points, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+def _distance_rows(mat, sources, points, passable_value=1):
+    """
+    Filas de la matriz de distancias para los puntos `sources` (índices en
+    `points`): un BFS por fila sobre la grilla con borde, que corta apenas
+    alcanzó todos los puntos transitables.
+    """
+    mat = np.asarray(mat)
+    R, C = mat.shape
+    W, open_, _ = padded_grid(mat, passable_value)
+    idx = []
+    for r, c in points:
+        i = (r + 1) * W + c + 1 if 0 <= r < R and 0 <= c < C else -1
+        idx.append(i if i >= 0 and open_[i] else -1)
+    wanted = bytearray(len(open_))
+    for i in idx:
+        if i >= 0:
+            wanted[i] = 1
+    n_wanted = sum(wanted)
+    blank = array("i", [-1]) * len(open_)
+    offsets = (-W, W, -1, 1)
+
+    rows = np.full((len(sources), len(points)), -1, dtype=np.int32)
+    for k, s in enumerate(sources):
+        src = idx[s]
+        if src < 0:
+            continue
+        dist = array("i", blank)
+        dist[src] = 0
+        q = deque([src])
+        left = n_wanted - 1
+        while q and left:
+            u = q.popleft()
+            du = dist[u] + 1
+            for o in offsets:
+                v = u + o
+                if open_[v] and dist[v] < 0:
+                    dist[v] = du
+                    q.append(v)
+                    if wanted[v]:
+                        left -= 1
+        rows[k] = [dist[i] if i >= 0 else -1 for i in idx]
+    return rows
+
+def clear_distance_cache():
+    """Vacía la caché en memoria de distance_matrix (la de disco queda)"""
+    _DISTANCE_CACHE.clear()
+
+def _cached_matrix(key, cache_dir):
+    if key in _DISTANCE_CACHE:
+        return _DISTANCE_CACHE[key]
+    if cache_dir:
+        path = os.path.join(cache_dir, key + ".npy")
+        if os.path.exists(path):
+            _DISTANCE_CACHE[key] = np.load(path)
+            return _DISTANCE_CACHE[key]
+    return None
+
+def _store_matrix(key, matrix, cache_dir):
+    _DISTANCE_CACHE[key] = matrix
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = os.path.join(cache_dir, key + ".tmp.npy")
+        np.save(tmp, matrix)
+        os.replace(tmp, os.path.join(cache_dir, key + ".npy"))
+
+def distance_matrix(mat, points, passable_value=1, cache_dir=None):
+    """
+    Matriz int32 N×N con los pasos entre cada par de `points` [(r, c)]
+    (-1 si no hay camino o el punto no es transitable). Son N BFS, no N²
+    llamadas a bfs_shortest_path.
+    """
+    points = [tuple(p) for p in points]
+    key = distance_key(mat, points, passable_value)
+    matrix = _cached_matrix(key, cache_dir)
+    if matrix is None:
+        matrix = _distance_rows(mat, range(len(points)), points, passable_value)
+        _store_matrix(key, matrix, cache_dir)
+    return matrix
+
+def distance_matrices(grids, passable_value=1, workers=0, cache_dir=None):
+    """
+    {nombre: matriz N×N} para `grids` = {nombre: (mat, puntos)}. Lo que no
+    está en caché se reparte en tareas de (grilla, bloque de filas) entre
+    `workers` procesos (0 = núcleos disponibles).
+    """
+    result, pending = {}, {}
+    for name, (mat, points) in grids.items():
+        points = [tuple(p) for p in points]
+        key = distance_key(mat, points, passable_value)
+        matrix = _cached_matrix(key, cache_dir)
+        if matrix is not None:
+            result[name] = matrix
+        else:
+            pending[name] = (np.asarray(mat), points, key)
+            result[name] = np.full((len(points), len(points)), -1, dtype=np.int32)
+    if not pending:
+        return result
+
+    workers = workers or os.cpu_count() or 1
+    total = sum(len(points) for _, points, _ in pending.values())
+    chunk = max(1, math.ceil(total / (workers * 4)))
+    tasks = [(name, range(start, min(start + chunk, len(points))))
+             for name, (_, points, _) in pending.items()
+             for start in range(0, len(points), chunk)]
+    if workers == 1:
+        for name, rows in tasks:
+            mat, points, _ = pending[name]
+            result[name][rows.start:rows.stop] = _distance_rows(mat, rows, points, passable_value)
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            futures = {pool.submit(_distance_rows, pending[name][0], rows, pending[name][1],
+                                   passable_value): (name, rows) for name, rows in tasks}
+            for future in as_completed(futures):
+                name, rows = futures[future]
+                result[name][rows.start:rows.stop] = future.result()
+    for name, (_, _, key) in pending.items():
+        _store_matrix(key, result[name], cache_dir)
+    return result
+
+def bfs_shortest_path_legacy(mat, sources, targets, passable_value=1):
+    """
+    Implementación original con sets y dicts de tuplas (r,c). Se conserva
+    como referencia para bench_bfs.py; usar bfs_shortest_path.
+    """
     R, C = mat.shape
     q = deque()
     prev = {}
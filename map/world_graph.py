@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Grafo de Kanto cosido a partir de las grillas de map/matrices, con búsqueda
+jerárquica al estilo HPA*.
+
+Cada tramo de salidas de un borde y cada puerta marcada (extract_portals) es
+un portal. Dentro de un mapa, el costo portal→portal sale de los campos de
+distancia precalculados (distance_fields); entre mapas, los portales de los
+bordes que une MAP_LINKS se conectan con costo 1. Si un borde conectado no
+tiene tramos de salida (máscaras incompletas), se usa como portal la franja
+de la componente principal más cercana a ese borde.
+
+Una consulta corre Dijkstra sobre los portales (cientos de nodos) y después
+refina solo los mapas de la ruta elegida, bajando por los campos de distancia:
+
+    python world_graph.py
+    python world_graph.py --from Route21_North:2,15 --to Route2:49,20
+"""
+import argparse
+import heapq
+import os
+import numpy as np
+from route_utils import (load_map_matrix, extract_portals, portal_name, all_portal_cells,
+                         bfs_distance_field, astar_shortest_path)
+from distance_fields import load_fields, walkable_mask, descend
+from zone_graph import MAP_LINKS, main_component, border_cells, anchor_cell
+
+def portal_side(portal):
+    """'top:0' -> 'top', 'door:2' -> 'door'"""
+    return portal.split(":")[0]
+
+class WorldGraph:
+    """Portales de todos los mapas y aristas abstractas entre ellos"""
+
+    def __init__(self):
+        self.portals = []    # tablas de extract_portals, una por mapa
+        self.walkable = {}   # mapa -> grilla 0/1 de celdas pisables
+        self.fields = {}     # mapa -> {portal: campo de distancia (int32, -1 = inalcanzable)}
+        self.cells = {}      # mapa -> {portal: [(r, c), ...]}
+        self.edges = {}      # (mapa, portal) -> [((mapa, portal), costo)]
+        self.skipped = []    # conexiones de MAP_LINKS sin grilla o sin portales
+
+    @property
+    def nodes(self):
+        return [(name, portal) for name in self.cells for portal in self.cells[name]]
+
+    def add_map(self, matrices_dir, name, sides=(), passable_value=1):
+        """Carga la grilla y los campos de `name`; agrega portales de respaldo en `sides`"""
+        mat = load_map_matrix(matrices_dir, name)
+        if mat is None:
+            return False
+        mat = np.asarray(mat)
+        fields = load_fields(matrices_dir, name, mat, passable_value)
+        walkable = walkable_mask(mat, passable_value)
+        self.walkable[name] = walkable
+        self.fields[name] = {p: fields.fields[g] for g, p in enumerate(fields.names)}
+        portals = extract_portals(mat, name, passable_value)
+        self.portals.append(portals)
+        cells = all_portal_cells(mat, portals)
+        self.cells[name] = {portal_name(p): c for p, c in zip(portals, cells)}
+        component = None
+        for side in sides:
+            if any(portal_side(p) == side for p in self.cells[name]):
+                continue
+            if component is None:
+                component = main_component(mat, passable_value)
+            cells = border_cells(mat, side, component, passable_value)
+            if cells:
+                portal = f"{side}:cerca"
+                self.cells[name][portal] = cells
+                self.fields[name][portal] = bfs_distance_field(walkable, cells, passable_value=1)
+        return True
+
+    def link_intra(self, name):
+        """Aristas entre todo par de portales de `name`: mínimo del campo destino sobre el origen"""
+        for a, cells in self.cells[name].items():
+            rows, cols = np.array(cells).T
+            out = self.edges.setdefault((name, a), [])
+            for b, field in self.fields[name].items():
+                if a == b:
+                    continue
+                d = field[rows, cols]
+                d = d[d >= 0]
+                if d.size:
+                    out.append(((name, b), int(d.min())))
+
+    def link_maps(self, a, side_a, b, side_b):
+        """Conecta los portales del borde `side_a` de `a` con los de `side_b` de `b` (costo 1)"""
+        pa = [p for p in self.cells.get(a, ()) if portal_side(p) == side_a]
+        pb = [p for p in self.cells.get(b, ()) if portal_side(p) == side_b]
+        if not pa or not pb:
+            self.skipped.append((a, b))
+            return
+        for x in pa:
+            for y in pb:
+                self.edges.setdefault((a, x), []).append(((b, y), 1))
+                self.edges.setdefault((b, y), []).append(((a, x), 1))
+
+    def is_walkable(self, name, cell):
+        """True si `cell` (r, c) está dentro de la grilla de `name` y es pisable"""
+        if name not in self.walkable or cell is None:
+            return False
+        (r, c), (R, C) = cell, self.walkable[name].shape
+        return 0 <= r < R and 0 <= c < C and bool(self.walkable[name][r, c])
+
+    def route(self, src, dst, stats=None):
+        """
+        Camino de baldosas [(mapa, (r, c)), ...] de `src` a `dst`, ambos
+        (mapa, (r, c)); cada cambio de mapa cuenta como un paso. None si no hay
+        camino (también si algún extremo no es una celda pisable de su grilla).
+        En `stats` deja nodos abstractos expandidos, costo y baldosas.
+        """
+        (src_map, src_cell), (dst_map, dst_cell) = src, dst
+        for name, cell in (src, dst):
+            if not self.is_walkable(name, cell):
+                return None
+
+        # Aristas virtuales S -> portales del mapa origen, portales del mapa destino -> T
+        start = []
+        for portal, field in self.fields[src_map].items():
+            if field[src_cell] >= 0:
+                start.append((((src_map, portal), True), int(field[src_cell])))
+        goal = {}
+        for portal, field in self.fields[dst_map].items():
+            if field[dst_cell] >= 0:
+                goal[dst_map, portal] = int(field[dst_cell])
+        if src_map == dst_map:
+            direct = astar_shortest_path(self.walkable[src_map], [src_cell], {dst_cell})
+            if direct is not None:
+                start.append(("T", len(direct) - 1))
+
+        # Estado = (portal, llegó caminando dentro del mapa). Tras una arista
+        # interna solo se puede cruzar de mapa: el costo interno es el mínimo
+        # sobre todo el tramo de origen, y encadenar dos subestimaría el camino.
+        dist, prev = {"S": 0}, {}
+        heap, counter, expanded = [(0, 0, "S")], 1, 0
+        while heap:
+            d, _, state = heapq.heappop(heap)
+            if d > dist[state]:
+                continue
+            if state == "T":
+                break
+            expanded += 1
+            if state == "S":
+                out = start
+            else:
+                node, walked = state
+                out = [((nxt, nxt[0] == node[0]), w) for nxt, w in self.edges.get(node, [])
+                       if not walked or nxt[0] != node[0]]
+                if not walked and node in goal:
+                    out.append(("T", goal[node]))
+            for nxt, w in out:
+                nd = d + w
+                if nd < dist.get(nxt, float("inf")):
+                    dist[nxt], prev[nxt] = nd, state
+                    heapq.heappush(heap, (nd, counter, nxt))
+                    counter += 1
+        if stats is not None:
+            stats["expanded"] = expanded
+        if "T" not in prev:
+            return None
+
+        states = ["T"]
+        while states[-1] != "S":
+            states.append(prev[states[-1]])
+        abstract = [s if s in ("S", "T") else s[0] for s in reversed(states)]
+        path = self._refine(abstract, src, dst)
+        if stats is not None:
+            stats["cost"] = dist["T"]
+            stats["tiles"] = len(path) - 1
+            stats["maps"] = len(dict.fromkeys(name for name, _ in path))
+        return path
+
+    def _entry(self, node, after, dst):
+        """Celda de entrada al portal `node` según el tramo abstracto que sigue (`after`)"""
+        name, portal = node
+        cells = self.cells[name][portal]
+        if after == "T":
+            return descend(self.fields[name][portal], dst[1])[-1]
+        if after[0] == name:
+            field = self.fields[name][after[1]]
+            reachable = [rc for rc in cells if field[rc] >= 0]
+            if reachable:
+                return min(reachable, key=lambda rc: field[rc])
+        return cells[len(cells) // 2]
+
+    def _refine(self, abstract, src, dst):
+        """Baja por los campos de distancia solo en los mapas de la ruta abstracta"""
+        name, cur = src
+        path = [(name, cur)]
+        for node, nxt in zip(abstract[1:], abstract[2:] + [None]):
+            if node == "T":
+                if name != dst[0]:
+                    break
+                leg = astar_shortest_path(self.walkable[name], [cur], {dst[1]})
+            elif node[0] != name:
+                name, cur = node[0], self._entry(node, nxt, dst)
+                path.append((name, cur))
+                continue
+            else:
+                leg = descend(self.fields[name][node[1]], cur)
+            path.extend((name, rc) for rc in leg[1:])
+            cur = leg[-1]
+        return path
+
+def build_world_graph(matrices_dir, links=MAP_LINKS, passable_value=1):
+    """WorldGraph con todas las grillas de `matrices_dir` y las conexiones de `links`"""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(matrices_dir)
+                    if f.endswith((".csv", ".grid"))})
+    sides = {}
+    for a, side_a, b, side_b in links:
+        sides.setdefault(a, []).append(side_a)
+        sides.setdefault(b, []).append(side_b)
+    graph = WorldGraph()
+    for name in names:
+        if graph.add_map(matrices_dir, name, sides.get(name, ()), passable_value):
+            graph.link_intra(name)
+    for a, side_a, b, side_b in links:
+        graph.link_maps(a, side_a, b, side_b)
+    return graph
+
+def parse_point(graph, text):
+    """
+    'Mapa' (ancla de su componente principal) o 'Mapa:r,c' -> (mapa, (r, c)).
+    ValueError si el mapa no está, no tiene celdas pisables o la celda cae
+    fuera de la grilla.
+    """
+    name, _, cell = text.partition(":")
+    if name not in graph.walkable:
+        raise ValueError(f"{name}: no hay grilla para ese mapa")
+    R, C = graph.walkable[name].shape
+    if cell:
+        try:
+            r, c = (int(v) for v in cell.split(","))
+        except ValueError:
+            raise ValueError(f"{text}: la celda debe ser fila,col") from None
+        if not (0 <= r < R and 0 <= c < C):
+            raise ValueError(f"{text}: ({r}, {c}) fuera de la grilla de {R}x{C}")
+        return name, (r, c)
+    anchor = anchor_cell(main_component(graph.walkable[name]))
+    if anchor is None:
+        raise ValueError(f"{name}: la grilla no tiene celdas pisables")
+    return name, anchor
+
+def main():
+    ap = argparse.ArgumentParser(description="Rutas de baldosas entre mapas de Kanto (HPA*).")
+    ap.add_argument("--src", default="matrices", help="Carpeta de grillas (default: matrices).")
+    ap.add_argument("--from", dest="origin", default="PalletTown", help="Mapa o Mapa:fila,col (default: PalletTown).")
+    ap.add_argument("--to", dest="target", default="Route2", help="Mapa o Mapa:fila,col (default: Route2).")
+    args = ap.parse_args()
+
+    graph = build_world_graph(args.src)
+    n_edges = sum(len(out) for out in graph.edges.values())
+    print(f"✓ {len(graph.walkable)} mapas, {len(graph.nodes)} portales, {n_edges} aristas abstractas")
+    for a, b in graph.skipped:
+        print(f"⚠ omitida (sin grilla o sin portales): {a} <-> {b}")
+
+    try:
+        src, dst = parse_point(graph, args.origin), parse_point(graph, args.target)
+    except ValueError as e:
+        ap.error(str(e))
+    stats = {}
+    path = graph.route(src, dst, stats=stats)
+    if path is None:
+        print(f"❌ Sin camino de {src} a {dst}")
+        return
+    maps = list(dict.fromkeys(name for name, _ in path))
+    print(f"✓ {src} -> {dst}: {stats['tiles']} baldosas por {' > '.join(maps)}")
+    print(f"  {stats['expanded']} nodos abstractos expandidos, costo abstracto {stats['cost']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Grafo de zonas con distancias reales en baldosas.
+
+Las grillas de map/matrices no dicen con qué mapa limita cada borde, así que
+las conexiones del overworld de Kanto van en MAP_LINKS. Para cada conexión
+A-B el peso es lo que se camina desde el ancla de A (la celda de su mayor
+componente transitable más cercana al centro) hasta el borde que da a B, más
+el paso de borde, más lo que se camina en B hasta su ancla. Cada mapa
+necesita un BFS por borde conectado, así que el costo crece con las celdas
+de las grillas y no con zonas².
+"""
+import heapq
+import re
+import numpy as np
+from route_utils import load_map_matrix, detect_edge_exits, bfs_shortest_path
+
+# (mapa_a, borde_a, mapa_b, borde_b): conexiones directas entre grillas.
+# Las casetas (Entrance/Building) se tratan como parte del borde.
+MAP_LINKS = [
+    ("PalletTown", "top", "Route1", "bottom"),
+    ("PalletTown", "bottom", "Route21_North", "top"),
+    ("Route21_North", "bottom", "Route21_South", "top"),
+    ("Route1", "top", "ViridianCity", "bottom"),
+    ("ViridianCity", "top", "Route2", "bottom"),
+    ("ViridianCity", "left", "Route22", "right"),
+    ("Route22", "top", "Route23", "bottom"),
+    ("Route3", "top", "Route4", "bottom"),
+    ("Route24", "right", "Route25", "left"),
+    ("Route9", "right", "Route10", "top"),
+    ("Route11", "right", "Route12", "left"),
+    ("Route12", "bottom", "Route13", "right"),
+    ("Route13", "left", "Route14", "right"),
+    ("Route14", "left", "Route15", "right"),
+    ("Route16", "bottom", "Route17", "top"),
+    ("Route17", "bottom", "Route18", "left"),
+    ("Route19", "bottom", "Route20", "right"),
+]
+
+def map_zone_code(map_name):
+    """
+    'Route21_North' -> 'kanto-route-21', 'PalletTown' -> 'kanto-pallet-town'.
+    Devuelve None para casetas y edificios, que no son zonas de encuentros.
+    """
+    if "Entrance" in map_name or "Building" in map_name:
+        return None
+    base = map_name.split("_")[0]
+    words = re.findall(r"[A-Z][a-z]*|\d+", base)
+    return "kanto-" + "-".join(w.lower() for w in words)
+
+def main_component(mat, passable_value=1):
+    """
+    Máscara de la componente transitable más grande (4-vecinos). Las grillas
+    generadas desde fotos suelen traer islas sueltas que no llevan a nada.
+    """
+    passable = mat == passable_value
+    R, C = mat.shape
+    labels = np.zeros(mat.shape, dtype=np.int32)
+    best, best_size, current = 0, 0, 0
+    for r0, c0 in zip(*np.nonzero(passable)):
+        if labels[r0, c0]:
+            continue
+        current += 1
+        labels[r0, c0] = current
+        stack, size = [(r0, c0)], 0
+        while stack:
+            r, c = stack.pop()
+            size += 1
+            for nr, nc in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
+                if 0 <= nr < R and 0 <= nc < C and passable[nr, nc] and not labels[nr, nc]:
+                    labels[nr, nc] = current
+                    stack.append((nr, nc))
+        if size > best_size:
+            best, best_size = current, size
+    return labels == best if best else np.zeros(mat.shape, dtype=bool)
+
+def border_cells(mat, side, component, passable_value=1):
+    """
+    Salidas del borde `side` dentro de `component`. Si no hay ninguna (máscaras
+    incompletas), usa las celdas de la componente más cercanas a ese borde.
+    """
+    exits = [rc for rc in detect_edge_exits(mat, edge=side, passable_value=passable_value)
+             if component[rc]]
+    if exits:
+        return exits
+    rows, cols = np.nonzero(component)
+    if rows.size == 0:
+        return []
+    if side == "top":
+        keep = rows == rows.min()
+    elif side == "bottom":
+        keep = rows == rows.max()
+    elif side == "left":
+        keep = cols == cols.min()
+    else:
+        keep = cols == cols.max()
+    return list(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+def anchor_cell(component):
+    """Celda de la componente más cercana a su centroide (o None si está vacía)"""
+    rows, cols = np.nonzero(component)
+    if rows.size == 0:
+        return None
+    d = np.abs(rows - rows.mean()) + np.abs(cols - cols.mean())
+    i = int(np.argmin(d))
+    return int(rows[i]), int(cols[i])
+
+def walk_to_border(mat, side, component, passable_value=1):
+    """Baldosas desde el ancla del mapa hasta su borde `side` (None si no hay camino)"""
+    start = anchor_cell(component)
+    targets = set(border_cells(mat, side, component, passable_value))
+    if start is None or not targets:
+        return None
+    path = bfs_shortest_path(mat, [start], targets, passable_value=passable_value)
+    return None if path is None else len(path) - 1
+
+def build_map_edges(matrices_dir, links=MAP_LINKS, passable_value=1):
+    """
+    Devuelve ([(mapa_a, mapa_b, baldosas)], [conexiones omitidas]) para las
+    conexiones cuyos dos mapas existen y se pueden recorrer.
+    """
+    mats = {}
+    walks = {}
+
+    def walk(name, side):
+        if (name, side) not in walks:
+            if name not in mats:
+                mat = load_map_matrix(matrices_dir, name)
+                mats[name] = None if mat is None else (mat, main_component(mat, passable_value))
+            if mats[name] is None:
+                walks[name, side] = None
+            else:
+                mat, component = mats[name]
+                walks[name, side] = walk_to_border(mat, side, component, passable_value)
+        return walks[name, side]
+
+    edges, skipped = [], []
+    for a, side_a, b, side_b in links:
+        da, db = walk(a, side_a), walk(b, side_b)
+        if da is None or db is None:
+            skipped.append((a, b))
+            continue
+        edges.append((a, b, da + 1 + db))
+    return edges, skipped
+
+def zone_adjacency(matrices_dir, zone_codes, links=MAP_LINKS):
+    """
+    Aristas dirigidas {(zona_a, zona_b): baldosas} entre zonas de `zone_codes`.
+    Mapas de una misma zona (Route21_North/South) no generan aristas.
+    """
+    edges, skipped = build_map_edges(matrices_dir, links)
+    skipped = [(a, b) for a, b in skipped if map_zone_code(a) != map_zone_code(b)]
+    adjacency = {}
+    for a, b, tiles in edges:
+        za, zb = map_zone_code(a), map_zone_code(b)
+        if za == zb or za not in zone_codes or zb not in zone_codes:
+            continue
+        for key in ((za, zb), (zb, za)):
+            adjacency[key] = min(tiles, adjacency.get(key, tiles))
+    return adjacency, skipped
+
+def all_pairs_distances(adjacency):
+    """Dijkstra desde cada zona sobre el grafo disperso: {(a, b): baldosas}"""
+    graph = {}
+    for (a, b), w in adjacency.items():
+        graph.setdefault(a, []).append((b, w))
+
+    result = {}
+    for source in graph:
+        dist = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in graph.get(u, ()):
+                nd = d + w
+                if nd < dist.get(v, float("inf")):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        for target, d in dist.items():
+            if target != source:
+                result[source, target] = d
+    return result
+
+if __name__ == "__main__":
+    edges, skipped = build_map_edges("matrices")
+    for a, b, tiles in edges:
+        print(f"{a:>16} <-> {b:<16} {tiles:>4} baldosas")
+    for a, b in skipped:
+        print(f"omitida (sin camino): {a} <-> {b}")
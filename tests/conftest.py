@@ -0,0 +1,10 @@
+"""
+Los módulos del repo son scripts que se importan por nombre desde su carpeta
+(como hace load_data.py con map/), así que se agregan las tres al sys.path.
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("", "map", "locations"):
+    sys.path.insert(0, os.path.join(ROOT_DIR, folder))
@@ -0,0 +1,22 @@
+import os
+import pytest
+from scraper import parse_page_bs4, parse_page_lxml, lxml
+from bench_parse import FIXTURE_CSV, FIXTURE_PAGES, cached_pages, csv_text, saved_pages
+
+PARSERS = [parse_page_bs4] + ([parse_page_lxml] if lxml is not None else [])
+PAGES = saved_pages(FIXTURE_PAGES)
+
+
+@pytest.mark.parametrize("parser", PARSERS, ids=lambda p: p.__name__)
+@pytest.mark.parametrize("name, html", PAGES, ids=[name for name, _ in PAGES])
+def test_fixture_pages_match_golden_csv(parser, name, html):
+    golden = os.path.join(FIXTURE_CSV, name + ".csv")
+    expected = None
+    if os.path.exists(golden):
+        with open(golden, newline="", encoding="utf-8") as f:
+            expected = f.read()
+    assert csv_text(parser(html)) == expected
+
+
+def test_missing_cache_has_no_pages(tmp_path):
+    assert cached_pages(str(tmp_path / "no-existe")) == []
@@ -0,0 +1,59 @@
+import os
+import numpy as np
+from route_utils import (extract_portals, portal_cells, all_portal_cells, load_map_matrix,
+                         save_csv_matrix, save_grid)
+from distance_fields import exit_groups
+
+
+def test_doors_with_overlapping_boxes():
+    # Dos puertas con valor 2: la primera es una L cuyo rectángulo contiene a
+    # la segunda, que está separada por una celda bloqueada
+    mat = np.array([
+        [2, 2, 2, 0],
+        [0, 0, 2, 0],
+        [2, 0, 2, 1],
+        [0, 0, 0, 1],
+    ], dtype=np.uint8)
+    doors = [p for p in extract_portals(mat) if p["side"] == "door"]
+    assert [int(p["size"]) for p in doors] == [5, 1]
+
+    cells = [portal_cells(mat, p) for p in doors]
+    assert sorted(cells[0]) == [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2)]
+    assert cells[1] == [(2, 0)]
+    for p, c in zip(doors, cells):
+        assert len(c) == int(p["size"])
+
+    portals = extract_portals(mat)
+    assert all_portal_cells(mat, portals) == [portal_cells(mat, p) for p in portals]
+    groups = dict(exit_groups(mat))
+    assert sorted(groups["door:0"]) == sorted(cells[0])
+    assert groups["door:1"] == [(2, 0)]
+
+
+def test_door_sizes_match_cells_on_random_grids():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        mat = rng.choice([0, 1, 2, 3], size=(12, 15), p=[0.3, 0.4, 0.2, 0.1]).astype(np.uint8)
+        portals = extract_portals(mat)
+        for p, cells in zip(portals, all_portal_cells(mat, portals)):
+            assert len(cells) == int(p["size"])
+            if p["side"] == "door":
+                assert all(mat[rc] == p["label"] for rc in cells)
+
+
+def test_newer_csv_shadows_stale_grid(tmp_path, capsys):
+    old = np.array([[1, 1], [0, 1]], dtype=np.uint8)
+    new = np.array([[1, 0], [0, 1]], dtype=np.uint8)
+    csv_path, grid_path = tmp_path / "Mapa.csv", tmp_path / "Mapa.grid"
+    save_csv_matrix(old, str(csv_path))
+    save_grid(str(grid_path), {"passable": old})
+    os.utime(csv_path, (1000, 1000))
+    os.utime(grid_path, (2000, 2000))
+    assert np.array_equal(load_map_matrix(str(tmp_path), "Mapa"), old)
+    assert capsys.readouterr().out == ""
+
+    # CSV editado a mano después de generar el .grid
+    save_csv_matrix(new, str(csv_path))
+    os.utime(csv_path, (3000, 3000))
+    assert np.array_equal(load_map_matrix(str(tmp_path), "Mapa"), new)
+    assert "más nuevo" in capsys.readouterr().out
@@ -0,0 +1,183 @@
+"""
+scraper.py contra un servidor HTTP local que sirve las páginas de
+locations/fixtures como si fueran /location/<zona> de pokemondb.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import load_pipeline
+import scraper
+from bench_parse import FIXTURE_CSV, FIXTURE_PAGES
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """
+    /location/<zona> -> fixtures/pages/<zona>.html; /flaky/<zona> responde 503
+    la primera vez y la página después. Cuenta los pedidos por ruta.
+    """
+    hits = Counter()
+    lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURE_PAGES, **kwargs)
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] += 1
+            first = self.hits[self.path] == 1
+        slug = self.path.rstrip("/").split("/")[-1]
+        if self.path.startswith("/flaky/") and first:
+            self.send_error(503)
+            return
+        self.path = f"/{slug}.html"
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FixtureHandler.hits.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fixture_targets():
+    return sorted(f"/location/{os.path.splitext(f)[0]}" for f in os.listdir(FIXTURE_PAGES))
+
+
+def test_main_writes_expected_csv(server, tmp_path, monkeypatch):
+    out = tmp_path / "csv"
+    monkeypatch.setattr(scraper, "targets", fixture_targets())
+    monkeypatch.setattr(sys, "argv", ["scraper.py", "--base", server, "--out", str(out),
+                                      "--rate", "0", "--no-cache"])
+    scraper.main()
+
+    expected = sorted(os.listdir(FIXTURE_CSV))
+    assert sorted(os.listdir(out)) == expected
+    for name in expected:
+        assert (out / name).read_bytes() == open(os.path.join(FIXTURE_CSV, name), "rb").read()
+
+
+def test_retries_503_then_succeeds(server):
+    bucket = scraper.TokenBucket(0)
+    with scraper.make_session(1) as session:
+        resp = scraper.fetch(session, f"{server}/flaky/kanto-route-1", bucket, 1, backoff=0.01)
+    assert resp is not None and resp.status_code == 200
+    assert FixtureHandler.hits["/flaky/kanto-route-1"] == 2
+
+
+def test_404_fails_fast(server):
+    bucket = scraper.TokenBucket(0)
+    with scraper.make_session(1) as session:
+        resp = scraper.fetch(session, f"{server}/location/no-existe", bucket, 1, backoff=0.01)
+    assert resp is None
+    assert FixtureHandler.hits["/location/no-existe"] == 1
+
+
+def test_token_bucket_spacing():
+    rate = 20.0
+    bucket = scraper.TokenBucket(rate)
+    stamps = []
+    for _ in range(6):
+        bucket.acquire()
+        stamps.append(time.monotonic())
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    # El primer token está disponible de entrada; los siguientes llegan cada 1/rate
+    assert min(gaps) >= 0.9 / rate
+    assert stamps[-1] - stamps[0] >= 0.9 * 5 / rate
+
+
+def test_token_bucket_shared_between_threads():
+    rate = 20.0
+    bucket = scraper.TokenBucket(rate)
+    stamps, lock = [], threading.Lock()
+
+    def worker():
+        for _ in range(3):
+            bucket.acquire()
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stamps.sort()
+    assert stamps[-1] - stamps[0] >= 0.9 * 8 / rate
+
+
+def test_empty_level_is_skipped_like_the_csv_path():
+    data = [{"h3": "Walking", "generation": "Generation 3", "table": [
+        [{"text": "Pidgey"}, {"text": "Common"}, {"text": "2-5"}],
+        [{"text": "Rattata"}, {"text": "Common"}, {"text": None}],
+        [{"text": "Spearow"}, {"text": None}, {"text": "3"}],
+    ]}]
+    rows = scraper.page_rows(data)
+    assert rows[1]["Nivel"] == "" and rows[2]["Rareza"] == ""
+
+    index = load_pipeline.index_pokemon([(16, "Pidgey"), (19, "Rattata"), (21, "Spearow")])
+    unmatched = Counter()
+    encounters = list(load_pipeline.normalize_encounters(((7, row) for row in rows), index, unmatched))
+    kept = [(zone, pokemon_id, min_level) for zone, pokemon_id, _, _, min_level, *_ in encounters]
+    assert kept == [(7, 16, 2), (7, 21, 3)]
+    assert not unmatched
+
+
+class RecordingLoader:
+    """Reemplaza a ZoneLoader (que necesita Postgres) y anota qué zonas recibe"""
+    zones = {}
+
+    def __init__(self, mode="batch"):
+        pass
+
+    def load(self, zone_code, rows):
+        self.zones[zone_code] = rows
+        return True
+
+    def close(self):
+        pass
+
+
+def test_postgres_sink_loads_pages_answered_with_304(server, tmp_path, monkeypatch):
+    args = ["--base", server, "--out", str(tmp_path / "csv"), "--rate", "0",
+            "--cache", str(tmp_path / "cache")]
+    monkeypatch.setattr(scraper, "targets", fixture_targets())
+    monkeypatch.setattr(sys, "argv", ["scraper.py"] + args)
+    scraper.main()
+
+    # Segunda corrida con la caché llena: el servidor responde 304 a todo
+    RecordingLoader.zones = {}
+    monkeypatch.setattr(scraper, "ZoneLoader", RecordingLoader)
+    monkeypatch.setattr(sys, "argv", ["scraper.py"] + args + ["--sink", "postgres"])
+    FixtureHandler.hits.clear()
+    scraper.main()
+
+    expected = {os.path.splitext(name)[0] for name in os.listdir(FIXTURE_CSV)}
+    assert set(RecordingLoader.zones) == expected
+    assert all(RecordingLoader.zones.values())
+
+
+def test_304_without_cached_body_refetches(server, tmp_path, capsys):
+    cache = scraper.HttpCache(str(tmp_path / "cache"))
+    bucket = scraper.TokenBucket(0)
+    path = "/location/kanto-route-1"
+    with scraper.make_session(1) as session:
+        first = scraper.fetch_request(path, 1, session, bucket, server, cache)
+        # Queda el .json con Last-Modified pero se pierde el cuerpo
+        os.remove(cache._paths(f"{server}{path}")[1])
+        FixtureHandler.hits.clear()
+        again = scraper.fetch_request(path, 1, session, bucket, server, cache, reparse=True)
+    assert again == first and again
+    assert FixtureHandler.hits[path] == 2
+    assert "sin cuerpo en la caché" in capsys.readouterr().out
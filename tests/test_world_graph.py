@@ -0,0 +1,38 @@
+import os
+import shutil
+import pytest
+from world_graph import build_world_graph, parse_point
+
+MATRICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "map", "matrices")
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    # Route21_South no tiene celdas pisables en el repo; PalletTown sí
+    src = tmp_path_factory.mktemp("matrices")
+    for name in ("Route21_South", "PalletTown"):
+        shutil.copy(os.path.join(MATRICES_DIR, name + ".csv"), src)
+    return build_world_graph(str(src))
+
+
+def test_empty_grid_has_no_anchor(graph):
+    assert not graph.walkable["Route21_South"].any()
+    with pytest.raises(ValueError, match="no tiene celdas pisables"):
+        parse_point(graph, "Route21_South")
+    pallet = parse_point(graph, "PalletTown")
+    assert graph.route(("Route21_South", None), pallet) is None
+    assert graph.route(pallet, ("Route21_South", (0, 0))) is None
+
+
+def test_cells_outside_the_grid(graph):
+    R, C = graph.walkable["PalletTown"].shape
+    for text in ("PalletTown:-1,3", f"PalletTown:{R},0", f"PalletTown:0,{C}"):
+        with pytest.raises(ValueError, match="fuera de la grilla"):
+            parse_point(graph, text)
+    with pytest.raises(ValueError, match="no hay grilla"):
+        parse_point(graph, "NoExiste")
+
+    pallet = parse_point(graph, "PalletTown")
+    assert graph.route(("PalletTown", (-1, 3)), pallet) is None
+    assert graph.route(pallet, ("PalletTown", (R, 0))) is None
+    assert graph.route(pallet, pallet) == [pallet]
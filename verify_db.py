@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 """
 Script para verificar que la base de datos tiene los datos cargados
+
+    python verify_db.py           # conteos y muestras
+    python verify_db.py --bench   # zone_ev_rates vs zone_ev_rates_mv
 """
 
 import psycopg2
 import os
+import sys
+import time
 
 DB_CONFIG = {
     'host': os.getenv('PGHOST', 'localhost'),
@@ -14,6 +19,51 @@ DB_CONFIG = {
     'port': int(os.getenv('PGPORT', 5432))
 }
 
+STATS = ('hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')
+
+def ev_rates_source(cursor):
+    """
+    zone_ev_rates_mv si existe y ya tiene datos; si no (esquema anterior o MV
+    sin refrescar), la vista zone_ev_rates
+    """
+    cursor.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = 'zone_ev_rates_mv'")
+    row = cursor.fetchone()
+    if row is None or not row[0]:
+        print("⚠ zone_ev_rates_mv no existe o no está refrescada; se usa zone_ev_rates")
+        return 'zone_ev_rates'
+    return 'zone_ev_rates_mv'
+
+def benchmark_ev_rates(cursor, runs=200):
+    """Compara el ranking de zonas por estadística en la vista y en la materializada"""
+    print(f"⏱ Ranking de zonas por estadística ({runs} consultas por fuente)\n")
+    print("{:<18} {:>12} {:>12}   {}".format("Fuente", "ms/consulta", "consultas/s", "Plan"))
+    print("-" * 70)
+
+    sources = ['zone_ev_rates']
+    if ev_rates_source(cursor) == 'zone_ev_rates_mv':
+        sources.append('zone_ev_rates_mv')
+    for source in sources:
+        queries = [f"""
+            SELECT zone_name, avg_ev_{stat}
+            FROM {source}
+            WHERE encounter_method = 'Walking'
+            ORDER BY avg_ev_{stat} DESC
+            LIMIT 5
+        """ for stat in STATS]
+
+        cursor.execute("EXPLAIN " + queries[-1])
+        plan = [row[0].strip().lstrip('->').strip().split('  (')[0] for row in cursor.fetchall()]
+        scan = next((line for line in plan if 'Scan' in line), plan[0])
+
+        start = time.perf_counter()
+        for i in range(runs):
+            cursor.execute(queries[i % len(queries)])
+            cursor.fetchall()
+        elapsed = time.perf_counter() - start
+
+        print("{:<18} {:>12.3f} {:>12.0f}   {}".format(
+            source, elapsed / runs * 1000, runs / elapsed, scan))
+
 def verify_data():
     print("🔍 Verificando datos en la base de datos...\n")
     
@@ -60,10 +110,10 @@ def verify_data():
         
         # Mostrar zonas con mejor tasa de EVs
         print("\n🎯 Top 5 zonas para entrenar Speed:")
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT zone_name, ROUND(avg_ev_speed::numeric, 2) as speed_rate, pokemon_count
-            FROM zone_ev_rates
-            WHERE avg_ev_speed > 0
+            FROM {ev_rates_source(cursor)}
+            WHERE encounter_method = 'Walking' AND avg_ev_speed > 0
             ORDER BY avg_ev_speed DESC
             LIMIT 5
         """)
@@ -83,4 +133,9 @@ def verify_data():
         traceback.print_exc()
 
 if __name__ == '__main__':
-    verify_data()
+    if '--bench' in sys.argv[1:]:
+        conn = psycopg2.connect(**DB_CONFIG)
+        benchmark_ev_rates(conn.cursor())
+        conn.close()
+    else:
+        verify_data()